@@ -0,0 +1,43 @@
+from django.contrib import admin
+
+from analytics.models import DailyDietStats, DailyMealTypeStats, DailyRevenue, DailySubscriptionSummary
+
+
+class RollupAdmin(admin.ModelAdmin):
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(RollupAdmin):
+    list_display = ('date', 'payments_count', 'revenue')
+
+
+@admin.register(DailySubscriptionSummary)
+class DailySubscriptionSummaryAdmin(RollupAdmin):
+    list_display = ('date', 'active_count', 'new_count', 'churned_count', 'churn_rate')
+
+    def churn_rate(self, obj):
+        return f'{obj.churn_rate} %'
+
+    churn_rate.short_description = 'Отток'
+
+
+@admin.register(DailyDietStats)
+class DailyDietStatsAdmin(RollupAdmin):
+    list_display = ('date', 'diet_type', 'active_count')
+    list_filter = ('diet_type',)
+
+
+@admin.register(DailyMealTypeStats)
+class DailyMealTypeStatsAdmin(RollupAdmin):
+    list_display = ('date', 'meal_type', 'subscribers_count')
+    list_filter = ('meal_type',)
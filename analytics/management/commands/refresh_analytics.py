@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Обновляет дневные сводки по выручке и подпискам: новые дни и последние ANALYTICS_REFRESH_DAYS дней'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            default=None,
+            help='Пересчитать сводки начиная с даты (ГГГГ-ММ-ДД)',
+        )
+
+    def handle(self, *args, **options):
+        since = refresh_rollups(options['since'])
+        self.stdout.write(self.style.SUCCESS(f'Сводки обновлены начиная с {since}'))
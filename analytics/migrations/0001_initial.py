@@ -0,0 +1,73 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('payments_count', models.PositiveIntegerField(default=0, verbose_name='Количество платежей')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Выручка за день',
+                'verbose_name_plural': 'Выручка по дням',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySubscriptionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('active_count', models.PositiveIntegerField(default=0, verbose_name='Активных подписок')),
+                ('new_count', models.PositiveIntegerField(default=0, verbose_name='Новых подписок')),
+                ('churned_count', models.PositiveIntegerField(default=0, verbose_name='Закончившихся подписок')),
+            ],
+            options={
+                'verbose_name': 'Сводка по подпискам за день',
+                'verbose_name_plural': 'Сводки по подпискам',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyDietStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('diet_type', models.CharField(choices=[('classic', 'Классическое'), ('low_carb', 'Низкоуглеводное'), ('vegetarian', 'Вегетарианское'), ('keto', 'Кето')], verbose_name='Тип диеты')),
+                ('active_count', models.PositiveIntegerField(default=0, verbose_name='Активных подписок')),
+            ],
+            options={
+                'verbose_name': 'Подписчики по типу диеты',
+                'verbose_name_plural': 'Подписчики по типам диет',
+                'ordering': ['-date', 'diet_type'],
+                'unique_together': {('date', 'diet_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyMealTypeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('meal_type', models.CharField(choices=[('breakfast', 'Завтраки'), ('lunch', 'Обеды'), ('dinner', 'Ужины'), ('dessert', 'Десерты')], max_length=20, verbose_name='Приём пищи')),
+                ('subscribers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+            ],
+            options={
+                'verbose_name': 'Подписчики по приёму пищи',
+                'verbose_name_plural': 'Подписчики по приёмам пищи',
+                'ordering': ['-date', 'meal_type'],
+                'unique_together': {('date', 'meal_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,111 @@
+from decimal import Decimal
+
+from django.db import models
+
+from planner.models import DietTypeChoices, MealTypeChoices
+
+
+class DailyRevenue(models.Model):
+    date = models.DateField(
+        'Дата',
+        unique=True,
+    )
+    payments_count = models.PositiveIntegerField(
+        'Количество платежей',
+        default=0,
+    )
+    revenue = models.DecimalField(
+        'Выручка',
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Выручка за день'
+        verbose_name_plural = 'Выручка по дням'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f'{self.date}: {self.revenue}'
+
+
+class DailySubscriptionSummary(models.Model):
+    date = models.DateField(
+        'Дата',
+        unique=True,
+    )
+    active_count = models.PositiveIntegerField(
+        'Активных подписок',
+        default=0,
+    )
+    new_count = models.PositiveIntegerField(
+        'Новых подписок',
+        default=0,
+    )
+    churned_count = models.PositiveIntegerField(
+        'Закончившихся подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Сводка по подпискам за день'
+        verbose_name_plural = 'Сводки по подпискам'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f'{self.date}: {self.active_count}'
+
+    @property
+    def churn_rate(self):
+        base = self.active_count + self.churned_count
+        if not base:
+            return Decimal('0')
+        return (Decimal(self.churned_count) * 100 / base).quantize(Decimal('0.01'))
+
+
+class DailyDietStats(models.Model):
+    date = models.DateField(
+        'Дата',
+    )
+    diet_type = models.CharField(
+        'Тип диеты',
+        choices=DietTypeChoices.choices,
+    )
+    active_count = models.PositiveIntegerField(
+        'Активных подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Подписчики по типу диеты'
+        verbose_name_plural = 'Подписчики по типам диет'
+        unique_together = ['date', 'diet_type']
+        ordering = ['-date', 'diet_type']
+
+    def __str__(self):
+        return f'{self.date}: {self.get_diet_type_display()}'
+
+
+class DailyMealTypeStats(models.Model):
+    date = models.DateField(
+        'Дата',
+    )
+    meal_type = models.CharField(
+        'Приём пищи',
+        max_length=20,
+        choices=MealTypeChoices.choices,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Подписчики по приёму пищи'
+        verbose_name_plural = 'Подписчики по приёмам пищи'
+        unique_together = ['date', 'meal_type']
+        ordering = ['-date', 'meal_type']
+
+    def __str__(self):
+        return f'{self.date}: {self.get_meal_type_display()}'
@@ -0,0 +1,115 @@
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from analytics.models import DailyDietStats, DailyMealTypeStats, DailyRevenue, DailySubscriptionSummary
+from payments.models import PaymentStatusChoices, SubscriptionPayment
+from planner.models import UserSubscription, mask_to_meal_types
+
+
+def _first_activity_date() -> date | None:
+    dates = [
+        UserSubscription.objects.aggregate(first=Min('start_date'))['first'],
+        SubscriptionPayment.objects.aggregate(first=Min(TruncDate('paid_at')))['first'],
+    ]
+    dates = [value for value in dates if value]
+    return min(dates) if dates else None
+
+
+def refresh_revenue(since: date):
+    # Выручка относится ко дню оплаты: дата создания платежа меняется при каждом его сохранении
+    paid_since = timezone.make_aware(datetime.combine(since, time.min))
+    rows = (
+        SubscriptionPayment.objects
+        .filter(status=PaymentStatusChoices.SUCCEEDED, paid_at__gte=paid_since)
+        .values(paid_on=TruncDate('paid_at'))
+        .annotate(payments_count=Count('pk'), revenue=Sum('amount'))
+        .order_by()
+    )
+    DailyRevenue.objects.filter(date__gte=since).delete()
+    DailyRevenue.objects.bulk_create(
+        DailyRevenue(date=row['paid_on'], payments_count=row['payments_count'], revenue=row['revenue'])
+        for row in rows
+    )
+
+
+def _subscription_history(since: date, until: date):
+    # Подписки с одинаковыми датами, диетой и приёмами пищи приходят одной строкой, а счётчики по дням
+    # собираются разностным массивом: +n в первый активный день периода и -n в день после последнего
+    rows = (
+        UserSubscription.objects
+        .filter(start_date__lte=until, end_date__gte=since - timedelta(days=1))
+        .values('start_date', 'end_date', 'is_suspended', 'diet_type', 'meal_types_mask')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    new = Counter()
+    churned = Counter()
+    deltas = {}
+    for row in rows:
+        count = row['count']
+        if since <= row['start_date'] <= until:
+            new[row['start_date']] += count
+        churned_on = row['end_date'] + timedelta(days=1)
+        if since <= churned_on <= until:
+            churned[churned_on] += count
+        first, last = max(row['start_date'], since), min(row['end_date'], until)
+        if row['is_suspended'] or first > last:
+            continue
+        keys = [None, ('diet_type', row['diet_type'])]
+        keys += [('meal_type', meal_type) for meal_type in mask_to_meal_types(row['meal_types_mask'])]
+        for key in keys:
+            deltas.setdefault(first, Counter())[key] += count
+            deltas.setdefault(last + timedelta(days=1), Counter())[key] -= count
+
+    active = Counter()
+    day = since
+    while day <= until:
+        active.update(deltas.get(day, {}))
+        yield day, active, new[day], churned[day]
+        day += timedelta(days=1)
+
+
+def refresh_subscriptions(since: date, until: date):
+    summaries, diet_stats, meal_type_stats = [], [], []
+    for day, active, new_count, churned_count in _subscription_history(since, until):
+        summaries.append(DailySubscriptionSummary(
+            date=day,
+            active_count=active[None],
+            new_count=new_count,
+            churned_count=churned_count,
+        ))
+        for key, count in active.items():
+            if key is None or not count:
+                continue
+            field, value = key
+            if field == 'diet_type':
+                diet_stats.append(DailyDietStats(date=day, diet_type=value, active_count=count))
+            else:
+                meal_type_stats.append(DailyMealTypeStats(date=day, meal_type=value, subscribers_count=count))
+
+    for model in (DailySubscriptionSummary, DailyDietStats, DailyMealTypeStats):
+        model.objects.filter(date__gte=since).delete()
+    DailySubscriptionSummary.objects.bulk_create(summaries)
+    DailyDietStats.objects.bulk_create(diet_stats)
+    DailyMealTypeStats.objects.bulk_create(meal_type_stats)
+
+
+def refresh_rollups(since: date | None = None) -> date:
+    today = timezone.now().date()
+    if since is None:
+        # Последние дни пересчитываются каждый раз: за них могли появиться оплаты, а подписки
+        # могли быть продлены или приостановлены
+        last = DailySubscriptionSummary.objects.aggregate(last=Max('date'))['last']
+        first = _first_activity_date() or today
+        since = max(min(last, today - timedelta(days=settings.ANALYTICS_REFRESH_DAYS)), first) if last else first
+
+    with transaction.atomic():
+        refresh_revenue(since)
+        refresh_subscriptions(since, today)
+    return since
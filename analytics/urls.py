@@ -0,0 +1,7 @@
+from django.urls import path
+
+from analytics import views
+
+urlpatterns = [
+    path('summary/', views.AnalyticsSummaryView.as_view(), name='analytics_summary'),
+]
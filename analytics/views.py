@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+
+from analytics.models import DailyDietStats, DailyMealTypeStats, DailyRevenue, DailySubscriptionSummary
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class AnalyticsSummaryView(View):
+    def get(self, request):
+        try:
+            days = min(max(int(request.GET.get('days', 30)), 1), 366)
+        except ValueError:
+            return JsonResponse({'error': 'Неверное количество дней'}, status=400)
+        since = timezone.now().date() - timedelta(days=days - 1)
+
+        summaries = DailySubscriptionSummary.objects.filter(date__gte=since).order_by('date')
+        return JsonResponse({
+            'revenue': list(
+                DailyRevenue.objects.filter(date__gte=since).order_by('date')
+                .values('date', 'payments_count', 'revenue'),
+            ),
+            'subscriptions': [
+                {
+                    'date': summary.date,
+                    'active': summary.active_count,
+                    'new': summary.new_count,
+                    'churned': summary.churned_count,
+                    'churn_rate': summary.churn_rate,
+                }
+                for summary in summaries
+            ],
+            'diet_types': list(
+                DailyDietStats.objects.filter(date__gte=since).order_by('date', 'diet_type')
+                .values('date', 'diet_type', 'active_count'),
+            ),
+            'meal_types': list(
+                DailyMealTypeStats.objects.filter(date__gte=since).order_by('date', 'meal_type')
+                .values('date', 'meal_type', 'subscribers_count'),
+            ),
+        })
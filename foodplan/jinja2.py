@@ -0,0 +1,34 @@
+from django.templatetags.static import static
+from django.template.defaultfilters import floatformat
+from django.urls import reverse
+from django.utils.formats import localize
+from django.utils.timezone import template_localtime
+from jinja2 import ChainableUndefined, Environment
+
+from planner.templatetags.form_tags import get_field
+from planner.templatetags.meal_tags import get_item
+
+
+def url(viewname, *args, **kwargs):
+    return reverse(viewname, args=args, kwargs=kwargs)
+
+
+def finalize(value):
+    # Как и шаблоны Django, выводит даты и числа с учётом локали
+    return localize(template_localtime(value))
+
+
+def environment(**options):
+    # Отсутствующие атрибуты выводятся пустой строкой, как в шаблонах Django
+    options['undefined'] = ChainableUndefined
+    env = Environment(finalize=finalize, **options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+    })
+    env.filters.update({
+        'floatformat': floatformat,
+        'get_field': get_field,
+        'get_item': get_item,
+    })
+    return env
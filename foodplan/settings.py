@@ -34,28 +34,70 @@ INSTALLED_APPS = [
     'planner.apps.PlannerConfig',
     'users.apps.UsersConfig',
     'payments.apps.PaymentsConfig',
+    'monitoring.apps.MonitoringConfig',
+    'analytics.apps.AnalyticsConfig',
 ]
 
+SESSION_METRICS_ENABLED = env.bool('SESSION_METRICS_ENABLED', False)
+SESSION_METRICS_URL_NAMES = ['order', 'yookassa_payment', 'yookassa_success']
+
+# Число запросов к БД и время обработки каждого запроса: заголовок Server-Timing и лог monitoring.requests
+REQUEST_METRICS_ENABLED = env.bool('REQUEST_METRICS_ENABLED', False)
+# Доля запросов, для которых в лог пишется полный список SQL-запросов
+REQUEST_METRICS_SAMPLE_RATE = env.float('REQUEST_METRICS_SAMPLE_RATE', 0.01)
+
+# Медленные запросы к БД и повторы одинаковых запросов за один HTTP-запрос (N+1) в логе monitoring.queries
+QUERY_LOG_ENABLED = env.bool('QUERY_LOG_ENABLED', False)
+SLOW_QUERY_THRESHOLD_MS = env.float('SLOW_QUERY_THRESHOLD_MS', 100)
+N_PLUS_ONE_THRESHOLD = env.int('N_PLUS_ONE_THRESHOLD', 5)
+
+# Профилирование запросов: сотрудникам по заголовку X-Profile или параметру ?_profile=1,
+# всем запросам дольше REQUEST_PROFILING_THRESHOLD_MS (0 - только по запросу)
+REQUEST_PROFILING_ENABLED = env.bool('REQUEST_PROFILING_ENABLED', False)
+REQUEST_PROFILING_THRESHOLD_MS = env.int('REQUEST_PROFILING_THRESHOLD_MS', 0)
+REQUEST_PROFILING_SAMPLE_INTERVAL_MS = env.int('REQUEST_PROFILING_SAMPLE_INTERVAL_MS', 5)
+REQUEST_PROFILING_EXPLAIN_LIMIT = 20
+# Сколько дней хранятся профили запросов, старые удаляет команда clear_request_profiles
+REQUEST_PROFILE_RETENTION_DAYS = env.int('REQUEST_PROFILE_RETENTION_DAYS', 14)
+
+# Токен для /metrics (заголовок Authorization: Bearer <токен>); без токена эндпоинт доступен только при DEBUG
+METRICS_TOKEN = env.str('METRICS_TOKEN', '')
+
 MIDDLEWARE = [
+    *(['monitoring.middleware.RequestMetricsMiddleware'] if REQUEST_METRICS_ENABLED else []),
+    *(['monitoring.middleware.QueryLogMiddleware'] if QUERY_LOG_ENABLED else []),
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    (
+        'monitoring.middleware.SessionMetricsMiddleware'
+        if SESSION_METRICS_ENABLED
+        else 'django.contrib.sessions.middleware.SessionMiddleware'
+    ),
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    *(['monitoring.middleware.RequestProfilingMiddleware'] if REQUEST_PROFILING_ENABLED else []),
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'foodplan.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [
             os.path.join(BASE_DIR, 'templates'),
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны хранятся в памяти процесса; при DEBUG кэш сбрасывается автоперезагрузкой
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -64,8 +106,25 @@ TEMPLATES = [
             ],
         },
     },
+    {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [
+            os.path.join(BASE_DIR, 'jinja2'),
+        ],
+        'OPTIONS': {
+            'environment': 'foodplan.jinja2.environment',
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
 ]
 
+# Страницы, которые рендерятся Jinja2 вместо шаблонов Django, например profile.html,order.html
+JINJA2_TEMPLATES = env.list('JINJA2_TEMPLATES', [])
+
 WSGI_APPLICATION = 'foodplan.wsgi.application'
 
 # Database
@@ -78,6 +137,24 @@ DATABASES = {
     },
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': env.str('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env.str('CACHE_LOCATION', ''),
+    },
+}
+
+# Sessions
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/#configuring-the-session-engine
+# db - по умолчанию, cached_db - при общем для всех воркеров кэше (Redis, Memcached),
+# signed_cookies - без обращений к БД и кэшу.
+
+SESSION_ENGINE = env.str('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+SESSION_CACHE_ALIAS = 'default'
+
 # AUTH
 AUTH_USER_MODEL = 'users.CustomUser'
 LOGIN_REDIRECT_URL = reverse_lazy('profile')
@@ -127,3 +204,52 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Email
+# https://docs.djangoproject.com/en/5.2/topics/email/
+
+EMAIL_BACKEND = env.str('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = env.str('EMAIL_HOST', 'localhost')
+EMAIL_PORT = env.int('EMAIL_PORT', 25)
+EMAIL_HOST_USER = env.str('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = env.str('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', False)
+DEFAULT_FROM_EMAIL = env.str('DEFAULT_FROM_EMAIL', 'noreply@foodplan.ru')
+
+# Payments
+YOOKASSA_SHOP_ID = env.str('YOOKASSA_SHOP_ID', '')
+YOOKASSA_SECRET_KEY = env.str('YOOKASSA_SECRET_KEY', '')
+YOOKASSA_API_URL = env.str('YOOKASSA_API_URL', 'https://api.yookassa.ru/v3')
+YOOKASSA_WEBHOOK_CHECK_IP = env.bool('YOOKASSA_WEBHOOK_CHECK_IP', True)
+PAYMENTS_WORKER_THREADS = env.int('PAYMENTS_WORKER_THREADS', 2)
+PAYMENT_GATEWAY = env.str('PAYMENT_GATEWAY', 'payments.gateway.YookassaGateway')
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = env.float('PAYMENT_GATEWAY_CONNECT_TIMEOUT', 3.05)
+PAYMENT_GATEWAY_READ_TIMEOUT = env.float('PAYMENT_GATEWAY_READ_TIMEOUT', 10)
+PAYMENT_GATEWAY_RETRIES = env.int('PAYMENT_GATEWAY_RETRIES', 2)
+# Предел времени на запрос к платёжному сервису вместе со всеми повторами
+PAYMENT_GATEWAY_TOTAL_TIMEOUT = env.float('PAYMENT_GATEWAY_TOTAL_TIMEOUT', 15)
+
+# Analytics
+# Сколько последних дней сводок пересчитывается при каждом обновлении
+ANALYTICS_REFRESH_DAYS = env.int('ANALYTICS_REFRESH_DAYS', 35)
+
+# Logging
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'monitoring': {
+            'handlers': ['console'],
+            'level': env.str('MONITORING_LOG_LEVEL', 'INFO'),
+        },
+        'payments': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
@@ -4,11 +4,15 @@ from django.contrib import admin
 from django.shortcuts import render
 from django.urls import include, path
 
+from monitoring.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
     path('payments/', include('payments.urls')),
     path('planner/', include('planner.urls')),
+    path('analytics/', include('analytics.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('', render, kwargs={'template_name': 'index.html'}, name='index'),
 ]
 
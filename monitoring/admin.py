@@ -0,0 +1,45 @@
+from django.contrib import admin
+from django.utils.html import format_html, format_html_join
+
+from monitoring.models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'url_name', 'method', 'status_code', 'duration_ms', 'query_count', 'db_time_ms',
+                    'trigger', 'user')
+    list_filter = ('trigger', 'url_name', 'status_code')
+    list_select_related = ('user',)
+    search_fields = ('path', 'url_name')
+    date_hierarchy = 'created_at'
+    show_full_result_count = False
+    fields = ('created_at', 'url_name', 'path', 'method', 'user', 'status_code', 'trigger', 'duration_ms',
+              'query_count', 'db_time_ms', 'profile_report', 'queries_report')
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match.url_name.endswith('changelist'):
+            return queryset.defer('profile', 'queries')
+        return queryset
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def profile_report(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.profile)
+
+    profile_report.short_description = 'Профиль'
+
+    def queries_report(self, obj):
+        return format_html_join(
+            '',
+            '<div style="margin-bottom: 1em;"><strong>{} мс</strong><pre style="white-space: pre-wrap;">{}</pre>'
+            '<pre style="white-space: pre; color: #666;">{}</pre></div>',
+            ((query['duration_ms'], query['sql'], query['plan']) for query in obj.queries),
+        )
+
+    queries_report.short_description = 'SQL-запросы и планы'
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from monitoring.models import RequestProfile
+
+
+class Command(BaseCommand):
+    help = 'Удаляет профили запросов старше REQUEST_PROFILE_RETENTION_DAYS дней пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество профилей, удаляемых одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        expired_before = timezone.now() - timedelta(days=settings.REQUEST_PROFILE_RETENTION_DAYS)
+        deleted_total = 0
+        while True:
+            profile_ids = list(
+                RequestProfile.objects
+                .filter(created_at__lt=expired_before)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not profile_ids:
+                break
+            deleted, _ = RequestProfile.objects.filter(pk__in=profile_ids).delete()
+            deleted_total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f'Удалено устаревших профилей запросов: {deleted_total}'))
@@ -0,0 +1,37 @@
+from prometheus_client import Counter, Histogram
+
+# При запуске в несколько процессов (gunicorn, uwsgi) значения пишутся в файлы процесса
+# в каталоге PROMETHEUS_MULTIPROC_DIR и суммируются при чтении /metrics
+
+MENU_GENERATIONS = Counter(
+    'foodplan_menu_generations_total',
+    'Генерации дневного меню',
+    ['trigger'],
+)
+MENU_GENERATION_SECONDS = Histogram(
+    'foodplan_menu_generation_seconds',
+    'Время генерации дневного меню',
+    ['trigger'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+MENU_ELIGIBLE_DISHES = Histogram(
+    'foodplan_menu_eligible_dishes',
+    'Число блюд, подходящих под подписку, на один приём пищи',
+    ['meal_type'],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+PRICE_CALCULATIONS = Counter(
+    'foodplan_price_calculations_total',
+    'Расчёты стоимости подписки',
+    ['outcome'],
+)
+PAYMENT_CREATION_SECONDS = Histogram(
+    'foodplan_payment_creation_seconds',
+    'Время создания платежа в платёжном сервисе',
+    ['outcome'],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20),
+)
+SUBSCRIPTION_ACTIVATIONS = Counter(
+    'foodplan_subscription_activations_total',
+    'Подписки, активированные после оплаты',
+)
@@ -0,0 +1,326 @@
+import functools
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connection
+from django.template.backends.django import Template as DjangoTemplate
+from django.template.backends.jinja2 import Template as Jinja2Template
+from django.urls import reverse
+
+from monitoring.models import ProfileTriggerChoices, RequestProfile
+from monitoring.profiling import DeterministicProfiler, QueryRecorder, StackSampler
+from monitoring.querylog import track_queries
+
+logger = logging.getLogger('monitoring.sessions')
+
+
+class _SessionQueryCounter:
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.table_name not in sql:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def _timed_session_store(store_class):
+    class TimedSessionStore(store_class):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.load_time = 0.0
+            self.save_time = 0.0
+            self._timing = False
+
+        def _timed(self, attribute, method, *args, **kwargs):
+            # save() нового ключа вызывает create(), а тот снова save(), время считается один раз
+            if self._timing:
+                return method(*args, **kwargs)
+            self._timing = True
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._timing = False
+                setattr(self, attribute, getattr(self, attribute) + time.perf_counter() - started)
+
+        def load(self):
+            return self._timed('load_time', super().load)
+
+        def save(self, *args, **kwargs):
+            return self._timed('save_time', super().save, *args, **kwargs)
+
+    # Соль подписи данных сессии берётся из имени класса, поэтому оно должно совпадать с исходным
+    TimedSessionStore.__name__ = store_class.__name__
+    TimedSessionStore.__qualname__ = store_class.__qualname__
+    return TimedSessionStore
+
+
+class SessionMetricsMiddleware(SessionMiddleware):
+    """Замена SessionMiddleware, замеряющая стоимость работы с сессией.
+
+    Для URL из SESSION_METRICS_URL_NAMES пишет в лог время загрузки и
+    сохранения сессии и число запросов к таблице сессий.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.SessionStore = _timed_session_store(self.SessionStore)
+        self.url_names = set(settings.SESSION_METRICS_URL_NAMES)
+        model_class = getattr(self.SessionStore, 'get_model_class', None)
+        self.table_name = model_class()._meta.db_table if model_class else None
+
+    def __call__(self, request):
+        if not self.table_name:
+            return super().__call__(request)
+        request._session_queries = counter = _SessionQueryCounter(self.table_name)
+        with connection.execute_wrapper(counter):
+            return super().__call__(request)
+
+    def process_response(self, request, response):
+        response = super().process_response(request, response)
+
+        match = getattr(request, 'resolver_match', None)
+        if match and match.url_name in self.url_names:
+            counter = getattr(request, '_session_queries', None)
+            logger.info(
+                'session overhead url=%s engine=%s load_ms=%.2f save_ms=%.2f queries=%d db_ms=%.2f',
+                match.url_name,
+                settings.SESSION_ENGINE,
+                request.session.load_time * 1000,
+                request.session.save_time * 1000,
+                counter.count if counter else 0,
+                counter.duration * 1000 if counter else 0.0,
+            )
+        return response
+
+
+request_logger = logging.getLogger('monitoring.requests')
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class _RequestMetrics:
+    def __init__(self, capture_queries: bool):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.view_started = None
+        self.rendering = False
+        self.queries = [] if capture_queries else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.query_count += 1
+            self.db_time += duration
+            if self.queries is not None:
+                # Параметры запросов не сохраняются: в них могут быть персональные данные
+                self.queries.append((duration, sql))
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def wrapper(self, *args, **kwargs):
+        metrics = _current_metrics.get()
+        # Вложенный render_to_string внутри шаблона уже учтён во внешнем рендеринге
+        if metrics is None or metrics.rendering:
+            return render(self, *args, **kwargs)
+        metrics.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.rendering = False
+
+    wrapper.timed = True
+    return wrapper
+
+
+def _install_template_timing():
+    for template_class in (DjangoTemplate, Jinja2Template):
+        if not getattr(template_class.render, 'timed', False):
+            template_class.render = _timed_render(template_class.render)
+
+
+class RequestMetricsMiddleware:
+    """Замеряет стоимость каждого запроса.
+
+    Число запросов к БД, время в БД, рендеринга шаблонов, представления и
+    общее время отдаются в заголовке Server-Timing и пишутся в лог с ключом
+    по имени URL. Для доли REQUEST_METRICS_SAMPLE_RATE запросов в лог
+    попадает и полный список SQL-запросов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        _install_template_timing()
+
+    def __call__(self, request):
+        metrics = _RequestMetrics(capture_queries=random.random() < self.sample_rate)
+        token = _current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        finished = time.perf_counter()
+
+        total_time = finished - started
+        view_time = finished - metrics.view_started if metrics.view_started is not None else 0.0
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.query_count} queries"',
+            f'tpl;dur={metrics.template_time * 1000:.2f}',
+            f'view;dur={view_time * 1000:.2f}',
+            f'total;dur={total_time * 1000:.2f}',
+        ))
+        self.log(request, response, metrics, view_time, total_time)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def log(self, request, response, metrics, view_time, total_time):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match else 'unresolved'
+        values = {
+            'url_name': url_name,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': metrics.query_count,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'view_ms': round(view_time * 1000, 2),
+            'total_ms': round(total_time * 1000, 2),
+        }
+        request_logger.info(
+            'request url=%(url_name)s method=%(method)s status=%(status)d queries=%(queries)d '
+            'db_ms=%(db_ms).2f template_ms=%(template_ms).2f view_ms=%(view_ms).2f total_ms=%(total_ms).2f',
+            values,
+            extra={'request_metrics': values},
+        )
+        if metrics.queries:
+            request_logger.info(
+                'request queries url=%s count=%d\n%s',
+                url_name,
+                metrics.query_count,
+                '\n'.join(f'{duration * 1000:.2f} ms {sql}' for duration, sql in metrics.queries),
+                extra={'request_metrics': values, 'queries': metrics.queries},
+            )
+
+
+profiling_logger = logging.getLogger('monitoring.profiling')
+
+
+class RequestProfilingMiddleware:
+    """Профилирование отдельных запросов по требованию.
+
+    Сотрудник включает его заголовком X-Profile или параметром ?_profile=1,
+    тогда запрос профилируется cProfile. При заданном
+    REQUEST_PROFILING_THRESHOLD_MS каждый запрос профилируется выборкой стека
+    общим для процесса потоком, а сохраняются только запросы дольше порога.
+    Профиль, SQL-запросы и планы их выполнения сохраняются в RequestProfile и
+    доступны в админ-панели, старше REQUEST_PROFILE_RETENTION_DAYS дней
+    удаляются командой clear_request_profiles.
+    """
+
+    header = 'X-Profile'
+    query_param = '_profile'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = settings.REQUEST_PROFILING_THRESHOLD_MS / 1000
+        self.sampler = StackSampler(settings.REQUEST_PROFILING_SAMPLE_INTERVAL_MS / 1000)
+
+    def get_trigger(self, request):
+        if request.headers.get(self.header):
+            trigger = ProfileTriggerChoices.HEADER
+        elif request.GET.get(self.query_param):
+            trigger = ProfileTriggerChoices.QUERY_PARAM
+        else:
+            return None
+        return trigger if request.user.is_staff else None
+
+    def __call__(self, request):
+        trigger = self.get_trigger(request)
+        if trigger:
+            profiler = DeterministicProfiler()
+        elif self.threshold:
+            profiler = self.sampler.track()
+        else:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            profiler.stop()
+        duration = time.perf_counter() - started
+
+        if not trigger and duration >= self.threshold:
+            trigger = ProfileTriggerChoices.THRESHOLD
+        if trigger:
+            profile = self.save(request, response, trigger, duration, profiler, recorder)
+            if profile and trigger != ProfileTriggerChoices.THRESHOLD:
+                response['X-Profile-Url'] = reverse('admin:monitoring_requestprofile_change', args=[profile.pk])
+        return response
+
+    def save(self, request, response, trigger, duration, profiler, recorder):
+        match = getattr(request, 'resolver_match', None)
+        try:
+            return RequestProfile.objects.create(
+                url_name=match.view_name if match else 'unresolved',
+                path=request.get_full_path()[:2000],
+                method=request.method,
+                user=request.user if request.user.is_authenticated else None,
+                status_code=response.status_code,
+                trigger=trigger,
+                duration_ms=round(duration * 1000, 2),
+                query_count=len(recorder.queries),
+                db_time_ms=round(recorder.db_time * 1000, 2),
+                profile=profiler.report(),
+                queries=recorder.explained(settings.REQUEST_PROFILING_EXPLAIN_LIMIT),
+            )
+        except Exception:
+            # Ошибка сохранения профиля не должна ломать ответ пользователю
+            profiling_logger.exception('Failed to save profile for %s', request.path)
+            return None
+
+
+class QueryLogMiddleware:
+    """Пишет в лог monitoring.queries медленные запросы к БД с местом вызова
+    и одинаковые запросы, повторённые за один HTTP-запрос N_PLUS_ONE_THRESHOLD
+    и более раз.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_queries() as stats:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        stats.log_duplicates(match.view_name if match else request.path)
+        return response
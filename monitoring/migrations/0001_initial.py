@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')),
+                ('url_name', models.CharField(db_index=True, max_length=150, verbose_name='Имя URL')),
+                ('path', models.CharField(max_length=2000, verbose_name='Путь')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('trigger', models.CharField(choices=[('header', 'Заголовок запроса'), ('query_param', 'Параметр запроса'), ('threshold', 'Порог длительности')], max_length=20, verbose_name='Причина')),
+                ('duration_ms', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Длительность, мс')),
+                ('query_count', models.PositiveIntegerField(verbose_name='Запросов к БД')),
+                ('db_time_ms', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Время в БД, мс')),
+                ('profile', models.TextField(blank=True, verbose_name='Профиль')),
+                ('queries', models.JSONField(default=list, help_text='Текст, длительность и план выполнения каждого запроса', verbose_name='SQL-запросы')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db import models
+
+
+class ProfileTriggerChoices(models.TextChoices):
+    HEADER = 'header', 'Заголовок запроса'
+    QUERY_PARAM = 'query_param', 'Параметр запроса'
+    THRESHOLD = 'threshold', 'Порог длительности'
+
+
+class RequestProfile(models.Model):
+    created_at = models.DateTimeField(
+        'Дата',
+        auto_now_add=True,
+        db_index=True,
+    )
+    url_name = models.CharField(
+        'Имя URL',
+        max_length=150,
+        db_index=True,
+    )
+    path = models.CharField(
+        'Путь',
+        max_length=2000,
+    )
+    method = models.CharField(
+        'Метод',
+        max_length=10,
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Пользователь',
+    )
+    status_code = models.PositiveSmallIntegerField(
+        'Код ответа',
+    )
+    trigger = models.CharField(
+        'Причина',
+        max_length=20,
+        choices=ProfileTriggerChoices.choices,
+    )
+    duration_ms = models.DecimalField(
+        'Длительность, мс',
+        max_digits=10,
+        decimal_places=2,
+    )
+    query_count = models.PositiveIntegerField(
+        'Запросов к БД',
+    )
+    db_time_ms = models.DecimalField(
+        'Время в БД, мс',
+        max_digits=10,
+        decimal_places=2,
+    )
+    profile = models.TextField(
+        'Профиль',
+        blank=True,
+    )
+    queries = models.JSONField(
+        'SQL-запросы',
+        default=list,
+        help_text='Текст, длительность и план выполнения каждого запроса',
+    )
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms} мс)'
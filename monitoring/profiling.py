@@ -0,0 +1,152 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.db import connection
+
+PROFILE_STATS_LIMIT = 60
+SAMPLER_REPORT_LIMIT = 40
+
+
+class StackSampler:
+    """Периодически снимает стеки потоков, обрабатывающих запросы.
+
+    В отличие от cProfile не замедляет каждый вызов функции, поэтому
+    подходит для профилирования всех запросов при заданном пороге. Один
+    фоновый поток на процесс обслуживает все запросы: запрос только
+    регистрирует свой поток на время обработки.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def track(self) -> 'StackSamples':
+        return StackSamples(self)
+
+    def add(self, samples: 'StackSamples'):
+        with self._lock:
+            self._tracked[samples.thread_id] = samples
+            # После fork поток сэмплера не переходит в дочерний процесс
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+
+    def remove(self, samples: 'StackSamples'):
+        with self._lock:
+            self._tracked.pop(samples.thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            # Снимки пишутся под блокировкой, чтобы после remove() профиль запроса больше не менялся
+            with self._lock:
+                if not self._tracked:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in self._tracked.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                        frame = frame.f_back
+                    if stack:
+                        samples.samples[tuple(reversed(stack))] += 1
+
+
+class StackSamples:
+    def __init__(self, sampler: StackSampler):
+        self.sampler = sampler
+        self.interval = sampler.interval
+        self.thread_id = threading.get_ident()
+        self.samples = Counter()
+
+    def start(self):
+        self.sampler.add(self)
+
+    def stop(self):
+        self.sampler.remove(self)
+
+    def report(self) -> str:
+        total = sum(self.samples.values())
+        if not total:
+            return ''
+        inclusive = Counter()
+        exclusive = Counter()
+        for stack, count in self.samples.items():
+            for function in set(stack):
+                inclusive[function] += count
+            exclusive[stack[-1]] += count
+
+        lines = [f'Снимков стека: {total}, интервал {self.interval * 1000:.0f} мс', '', 'всего%  своё%  функция']
+        for function, count in inclusive.most_common(SAMPLER_REPORT_LIMIT):
+            lines.append(f'{count / total:6.1%} {exclusive[function] / total:6.1%}  {function}')
+        return '\n'.join(lines)
+
+
+class DeterministicProfiler:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def report(self) -> str:
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_STATS_LIMIT)
+        return stream.getvalue()
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, many, time.perf_counter() - started))
+
+    @property
+    def db_time(self) -> float:
+        return sum(duration for *_, duration in self.queries)
+
+    def explained(self, limit: int) -> list[dict]:
+        # План строится только для самых долгих SELECT, остальные запросы сохраняются без него
+        slowest = sorted(
+            (index for index, (sql, _, many, _) in enumerate(self.queries)
+             if not many and sql.lstrip().upper().startswith('SELECT')),
+            key=lambda index: self.queries[index][3],
+            reverse=True,
+        )[:limit]
+        plans = {index: explain(self.queries[index][0], self.queries[index][1]) for index in slowest}
+        return [
+            {
+                'sql': sql,
+                'duration_ms': round(duration * 1000, 2),
+                'plan': plans.get(index, ''),
+            }
+            for index, (sql, _, _, duration) in enumerate(self.queries)
+        ]
+
+
+def explain(sql: str, params) -> str:
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+    except Exception as error:
+        return f'Не удалось получить план: {error}'
+    return '\n'.join(' '.join(str(column) for column in row) for row in rows)
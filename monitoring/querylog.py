@@ -0,0 +1,121 @@
+import logging
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('monitoring.queries')
+
+PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+# Кадры самого Django и кода мониторинга не помогают понять, откуда пришёл запрос
+SKIPPED_DIRS = (
+    str(Path(__file__).resolve().parent),
+    *(str(Path(path).resolve()) for path in sys.path if 'site-packages' in path),
+)
+
+
+def find_call_site() -> str:
+    """Строка проекта и строка шаблона, из которых выполнен запрос.
+
+    Например: «planner/models.py:812 in total_calories; profile.html:140».
+    """
+    code_site = template_site = None
+    frame = sys._getframe(1)
+    while frame is not None and not (code_site and template_site):
+        code = frame.f_code
+        if template_site is None and code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template_site = f'{origin.template_name}:{token.lineno}'
+        if (
+            code_site is None
+            and code.co_filename.startswith(PROJECT_DIR)
+            and not code.co_filename.startswith(SKIPPED_DIRS)
+        ):
+            code_site = f'{Path(code.co_filename).relative_to(PROJECT_DIR)}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return '; '.join(site for site in (code_site, template_site) if site) or 'unknown'
+
+
+class QueryStats:
+    """Execute-wrapper, который считает одинаковые запросы и пишет в лог медленные.
+
+    Место вызова определяется только для первого из одинаковых запросов и для
+    медленных, чтобы не разбирать стек на каждом запросе.
+    """
+
+    def __init__(self, slow_threshold_ms: float | None = None):
+        self.slow_threshold = (
+            settings.SLOW_QUERY_THRESHOLD_MS if slow_threshold_ms is None else slow_threshold_ms
+        ) / 1000
+        self.counts = Counter()
+        self.call_sites = {}
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.total += 1
+            self.counts[sql] += 1
+            if sql not in self.call_sites:
+                self.call_sites[sql] = find_call_site()
+            if self.slow_threshold and duration >= self.slow_threshold:
+                call_site = find_call_site()
+                logger.warning(
+                    'slow query duration_ms=%.2f site=%s sql=%s',
+                    duration * 1000,
+                    call_site,
+                    sql,
+                    extra={'duration_ms': round(duration * 1000, 2), 'call_site': call_site, 'sql': sql},
+                )
+
+    def duplicates(self, threshold: int | None = None) -> list[tuple[int, str, str]]:
+        threshold = settings.N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return [
+            (count, self.call_sites[sql], sql)
+            for sql, count in self.counts.most_common()
+            if count >= threshold
+        ]
+
+    def log_duplicates(self, label: str, threshold: int | None = None):
+        for count, call_site, sql in self.duplicates(threshold):
+            logger.warning(
+                'possible N+1 url=%s count=%d site=%s sql=%s',
+                label,
+                count,
+                call_site,
+                sql,
+                extra={'url_name': label, 'count': count, 'call_site': call_site, 'sql': sql},
+            )
+
+
+@contextmanager
+def track_queries(using: str = 'default', slow_threshold_ms: float | None = None):
+    stats = QueryStats(slow_threshold_ms)
+    with connections[using].execute_wrapper(stats):
+        yield stats
+
+
+@contextmanager
+def assert_no_n_plus_one(threshold: int | None = None, using: str = 'default'):
+    """Для тестов: падает, если одинаковый запрос выполнен threshold и более раз.
+
+        with assert_no_n_plus_one():
+            client.get(reverse('profile'))
+    """
+    with track_queries(using, slow_threshold_ms=0) as stats:
+        yield stats
+    duplicates = stats.duplicates(threshold)
+    if duplicates:
+        raise AssertionError('Повторяющиеся запросы (возможен N+1):\n' + '\n'.join(
+            f'{count} раз, {call_site}: {sql}' for count, call_site, sql in duplicates
+        ))
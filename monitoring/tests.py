@@ -0,0 +1,87 @@
+import io
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from monitoring.middleware import RequestMetricsMiddleware, RequestProfilingMiddleware
+from monitoring.models import ProfileTriggerChoices, RequestProfile
+
+LOOP_TEMPLATE = '{% for item in items %}{{ item }}{% endfor %}'
+
+
+class TemplateTimingTests(SimpleTestCase):
+    def get_template_time(self, engine):
+        def view(request):
+            return HttpResponse(engines[engine].from_string(LOOP_TEMPLATE).render({'items': range(5000)}))
+
+        with self.assertLogs('monitoring.requests'):
+            response = RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+        timings = dict(metric.split(';dur=') for metric in response['Server-Timing'].split(', '))
+        return float(timings['tpl'])
+
+    def test_django_template_time(self):
+        self.assertGreater(self.get_template_time('django'), 0)
+
+    def test_jinja2_template_time(self):
+        self.assertGreater(self.get_template_time('jinja2'), 0)
+
+
+@override_settings(REQUEST_PROFILING_THRESHOLD_MS=30, REQUEST_PROFILING_SAMPLE_INTERVAL_MS=1)
+class ThresholdProfilingTests(TestCase):
+    def view(self, request):
+        time.sleep(float(request.GET.get('sleep', 0)))
+        return HttpResponse()
+
+    def get(self, middleware, **params):
+        request = RequestFactory().get('/', params)
+        request.user = AnonymousUser()
+        return middleware(request)
+
+    def test_requests_share_one_sampler_thread(self):
+        middleware = RequestProfilingMiddleware(self.view)
+
+        with mock.patch('monitoring.profiling.threading.Thread', wraps=threading.Thread) as thread_class:
+            for _ in range(5):
+                self.get(middleware)
+            self.get(middleware, sleep=0.05)
+
+        self.assertEqual(thread_class.call_count, 1)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.trigger, ProfileTriggerChoices.THRESHOLD)
+        self.assertIn('Снимков стека', profile.profile)
+
+
+class ClearRequestProfilesTests(TestCase):
+    def create_profile(self, age):
+        profile = RequestProfile.objects.create(
+            url_name='profile',
+            path='/planner/profile/',
+            method='GET',
+            status_code=200,
+            trigger=ProfileTriggerChoices.THRESHOLD,
+            duration_ms=100,
+            query_count=0,
+            db_time_ms=0,
+        )
+        RequestProfile.objects.filter(pk=profile.pk).update(created_at=timezone.now() - age)
+        return profile
+
+    @override_settings(REQUEST_PROFILE_RETENTION_DAYS=7)
+    def test_deletes_expired_profiles(self):
+        for _ in range(3):
+            self.create_profile(timedelta(days=8))
+        recent = self.create_profile(timedelta(days=6))
+
+        stdout = io.StringIO()
+        call_command('clear_request_profiles', batch_size=2, stdout=stdout)
+
+        self.assertEqual(list(RequestProfile.objects.all()), [recent])
+        self.assertIn('Удалено устаревших профилей запросов: 3', stdout.getvalue())
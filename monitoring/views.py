@@ -0,0 +1,26 @@
+import os
+import secrets
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views import View
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+
+class MetricsView(View):
+    def get(self, request):
+        # Без токена метрики доступны только при DEBUG: в них есть данные о платежах и подписках
+        if settings.METRICS_TOKEN:
+            expected = f'Bearer {settings.METRICS_TOKEN}'
+            if not secrets.compare_digest(request.headers.get('Authorization', ''), expected):
+                return HttpResponseForbidden()
+        elif not settings.DEBUG:
+            return HttpResponseForbidden()
+
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
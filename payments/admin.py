@@ -5,5 +5,5 @@ from payments.models import SubscriptionPayment
 
 @admin.register(SubscriptionPayment)
 class SubscriptionPaymentAdmin(admin.ModelAdmin):
-    list_display = ('payment_id', 'user', 'provider', 'amount', 'created_at')
-    list_filter = ('provider',)
+    list_display = ('payment_id', 'user', 'provider', 'amount', 'status', 'created_at', 'paid_at')
+    list_filter = ('provider', 'status')
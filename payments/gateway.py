@@ -0,0 +1,218 @@
+import functools
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+from yookassa import Configuration, Payment
+from yookassa.client import ApiClient
+from yookassa.domain.common import HttpVerb, RequestObject
+from yookassa.domain.common.user_agent import UserAgent
+from yookassa.domain.request import PaymentRequest
+from yookassa.domain.response import PaymentResponse
+
+from payments.models import PaymentStatusChoices
+
+
+class PaymentGatewayError(Exception):
+    pass
+
+
+@dataclass
+class GatewayPayment:
+    id: str
+    status: str
+    confirmation_url: str = ''
+
+
+class PaymentGateway(ABC):
+    @abstractmethod
+    def create_payment(
+        self,
+        *,
+        amount,
+        description: str,
+        return_url: str,
+        customer: dict,
+        metadata: dict,
+        idempotency_key: str,
+    ) -> GatewayPayment:
+        ...
+
+    @abstractmethod
+    def get_payment(self, payment_id: str) -> GatewayPayment:
+        ...
+
+    # Для ASGI: запрос выполняется в пуле потоков и не блокирует цикл событий,
+    # у каждого потока пула своя сессия клиента
+    async def acreate_payment(self, **kwargs) -> GatewayPayment:
+        return await sync_to_async(self.create_payment, thread_sensitive=False)(**kwargs)
+
+    async def aget_payment(self, payment_id: str) -> GatewayPayment:
+        return await sync_to_async(self.get_payment, thread_sensitive=False)(payment_id)
+
+
+class PooledApiClient(ApiClient):
+    """Клиент SDK ЮKassa с переиспользуемым соединением и ограниченным временем запроса.
+
+    SDK открывает новую сессию на каждый запрос, ждёт ответа без ограничения
+    и берёт ключи из глобальной Configuration. Здесь ключи передаются клиенту,
+    у каждого потока своя requests.Session с keep-alive, а запрос вместе
+    с повторами укладывается в PAYMENT_GATEWAY_TOTAL_TIMEOUT. Повторы POST
+    безопасны, так как у каждого POST есть заголовок Idempotence-Key и он не
+    меняется между попытками. Ошибки сети, ответы с ошибкой и ответы не в JSON
+    (например, страница 502 прокси) превращаются в PaymentGatewayError.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    BACKOFF_FACTOR = 0.3
+
+    def __init__(self, shop_id, secret_key, api_url):
+        self.endpoint = api_url
+        self.shop_id = shop_id
+        self.shop_password = secret_key
+        self.auth_token = None
+        self.user_agent = UserAgent()
+        self._local = threading.local()
+
+    def get_session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def request(self, method='', path='', query_params=None, headers=None, body=None):
+        if isinstance(body, RequestObject):
+            body.validate()
+            body = dict(body)
+
+        request_headers = self.prepare_request_headers(headers)
+        if method.upper() == 'POST':
+            request_headers.setdefault('Idempotence-Key', str(uuid.uuid4()))
+        try:
+            raw_response = self.execute(body, method, path, query_params, request_headers)
+        except requests.RequestException as error:
+            raise PaymentGatewayError(f'ЮKassa недоступна: {error}') from error
+
+        try:
+            data = raw_response.json()
+        except ValueError:
+            data = None
+        if raw_response.status_code != 200:
+            description = data.get('description') if isinstance(data, dict) else None
+            raise PaymentGatewayError(
+                f'ЮKassa вернула ошибку {raw_response.status_code}: {description or raw_response.reason}',
+            )
+        if not isinstance(data, dict):
+            raise PaymentGatewayError('ЮKassa вернула ответ не в формате JSON')
+        return data
+
+    def execute(self, body, method, path, query_params, request_headers):
+        self.log_request(body, method, path, query_params, request_headers)
+        deadline = time.monotonic() + settings.PAYMENT_GATEWAY_TOTAL_TIMEOUT
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                raw_response = self.get_session().request(
+                    method,
+                    self.endpoint + path,
+                    params=query_params,
+                    headers=request_headers,
+                    json=body,
+                    timeout=(
+                        min(settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT, remaining),
+                        min(settings.PAYMENT_GATEWAY_READ_TIMEOUT, remaining),
+                    ),
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if not self.can_retry(attempt, deadline):
+                    raise
+            else:
+                if raw_response.status_code not in self.RETRY_STATUSES or not self.can_retry(attempt, deadline):
+                    break
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+        if Configuration.logger:
+            self.log_response(raw_response.content, self.get_response_info(raw_response), raw_response.headers)
+        return raw_response
+
+    def backoff(self, attempt):
+        return self.BACKOFF_FACTOR * 2 ** attempt
+
+    def can_retry(self, attempt, deadline):
+        # Повтор делается, только если после паузы до истечения общего времени ещё остаётся запас
+        return attempt < settings.PAYMENT_GATEWAY_RETRIES and time.monotonic() + self.backoff(attempt) < deadline
+
+
+class YookassaGateway(PaymentGateway):
+    def __init__(self):
+        self.client = PooledApiClient(
+            settings.YOOKASSA_SHOP_ID,
+            settings.YOOKASSA_SECRET_KEY,
+            settings.YOOKASSA_API_URL,
+        )
+
+    def create_payment(self, *, amount, description, return_url, customer, metadata, idempotency_key):
+        params = PaymentRequest({
+            'amount': {
+                'value': amount,
+                'currency': 'RUB',
+            },
+            'confirmation': {
+                'type': 'redirect',
+                'return_url': return_url,
+            },
+            'capture': True,
+            'description': description,
+            'metadata': metadata,
+            'receipt': {
+                'customer': customer,
+            },
+        })
+        payment = PaymentResponse(self.client.request(
+            HttpVerb.POST, Payment.base_path, None, {'Idempotence-Key': idempotency_key}, params,
+        ))
+        return GatewayPayment(payment.id, payment.status, payment.confirmation.confirmation_url)
+
+    def get_payment(self, payment_id):
+        if not payment_id:
+            raise PaymentGatewayError('Не указан идентификатор платежа')
+        payment = PaymentResponse(self.client.request(HttpVerb.GET, f'{Payment.base_path}/{payment_id}'))
+        return GatewayPayment(payment.id, payment.status)
+
+
+class FakeGateway(PaymentGateway):
+    """Шлюз без сетевых запросов для нагрузочного тестирования.
+
+    Сразу возвращает пользователя на return_url, а при проверке статуса
+    считает любой платёж оплаченным.
+    """
+
+    def __init__(self):
+        self.payments = {}
+        self.lock = threading.Lock()
+
+    def create_payment(self, *, amount, description, return_url, customer, metadata, idempotency_key):
+        with self.lock:
+            if idempotency_key not in self.payments:
+                self.payments[idempotency_key] = GatewayPayment(
+                    str(uuid.uuid4()),
+                    PaymentStatusChoices.PENDING,
+                    return_url,
+                )
+            return self.payments[idempotency_key]
+
+    def get_payment(self, payment_id):
+        return GatewayPayment(payment_id, PaymentStatusChoices.SUCCEEDED)
+
+
+@functools.cache
+def get_gateway() -> PaymentGateway:
+    return import_string(settings.PAYMENT_GATEWAY)()
@@ -0,0 +1,98 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from payments.gateway import PaymentGatewayError, get_gateway
+from payments.models import PaymentStatusChoices, SubscriptionPayment
+from payments.services import activate_payment, cancel_payment, suspend_failed_payments
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Сверяет статусы платежей с платёжным сервисом и приостанавливает неоплаченные подписки'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            default=None,
+            help='Сверять платежи начиная с даты (ГГГГ-ММ-ДД), по умолчанию за последние 30 дней',
+        )
+        parser.add_argument('--workers', type=int, default=8, help='Число параллельных запросов к платёжному сервису')
+        parser.add_argument('--batch-size', type=int, default=500, help='Количество платежей, загружаемых за раз')
+        parser.add_argument('--gateway', default=None, help='Класс платёжного шлюза, например payments.gateway.FakeGateway')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения, ничего не изменяя')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers и --batch-size должны быть положительными.')
+        since = options['since'] or timezone.now().date() - timedelta(days=30)
+        gateway = import_string(options['gateway'])() if options['gateway'] else get_gateway()
+
+        def fetch_status(payment_id):
+            # Любая ошибка по одному платежу не должна прерывать сверку остальных
+            try:
+                return gateway.get_payment(payment_id).status, None
+            except Exception as exc:
+                return None, exc
+
+        stats = {'checked': 0, 'errors': 0, 'activated': 0, 'canceled': 0, 'suspended': 0, 'mismatched': 0}
+        last_pk = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                # Постраничная выборка по первичному ключу, чтобы не держать в памяти все платежи
+                batch = list(
+                    SubscriptionPayment.objects
+                    .filter(created_at__gte=since, pk__gt=last_pk)
+                    .order_by('pk')
+                    .values('pk', 'payment_id', 'status')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1]['pk']
+
+                failed_pks = []
+                provider_statuses = executor.map(fetch_status, [payment['payment_id'] for payment in batch])
+                for payment, (provider_status, error) in zip(batch, provider_statuses):
+                    stats['checked'] += 1
+                    if error is not None:
+                        stats['errors'] += 1
+                        if not isinstance(error, PaymentGatewayError):
+                            logger.error('Payment %s check failed', payment['payment_id'], exc_info=error)
+                        self.stderr.write(f'{payment["payment_id"]}: не удалось получить статус: {error!r}')
+                        continue
+                    if provider_status == payment['status']:
+                        continue
+
+                    stats['mismatched'] += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'{payment["payment_id"]}: локально {payment["status"]}, у провайдера {provider_status}',
+                    ))
+                    if options['dry_run']:
+                        continue
+                    if payment['status'] == PaymentStatusChoices.PENDING:
+                        try:
+                            if provider_status == PaymentStatusChoices.SUCCEEDED:
+                                activate_payment(payment['payment_id'])
+                                stats['activated'] += 1
+                            elif provider_status == PaymentStatusChoices.CANCELED:
+                                cancel_payment(payment['payment_id'])
+                                stats['canceled'] += 1
+                        except Exception as exc:
+                            stats['errors'] += 1
+                            self.stderr.write(f'{payment["payment_id"]}: не удалось применить статус: {exc}')
+                    elif provider_status == PaymentStatusChoices.CANCELED:
+                        failed_pks.append(payment['pk'])
+
+                if failed_pks:
+                    stats['suspended'] += suspend_failed_payments(failed_pks)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Проверено: {checked}, ошибок: {errors}, расхождений: {mismatched}, '
+            'активировано: {activated}, отменено: {canceled}, приостановлено подписок: {suspended}'.format(**stats),
+        ))
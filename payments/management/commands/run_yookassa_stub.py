@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from payments.yookassa_stub import YookassaStubServer
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальную замену API ЮKassa (YOOKASSA_API_URL=http://127.0.0.1:8001/v3)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument(
+            '--webhook-url',
+            default='http://127.0.0.1:8000/payments/yookassa/webhook/',
+            help='Адрес, на который отправляются уведомления о платежах',
+        )
+
+    def handle(self, *args, **options):
+        server = YookassaStubServer((options['host'], options['port']), webhook_url=options['webhook_url'])
+        self.stdout.write(f'Заглушка ЮKassa запущена на {server.base_url}/v3')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
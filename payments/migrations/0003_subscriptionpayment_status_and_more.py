@@ -0,0 +1,34 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_subscriptionpayment_payment_id'),
+        ('planner', '0006_dailymenu_dailymeal'),
+    ]
+
+    operations = [
+        # Уже существующие платежи были активированы при возврате с ЮKassa.
+        migrations.AddField(
+            model_name='subscriptionpayment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает оплаты'), ('succeeded', 'Оплачен'), ('canceled', 'Отменён')], db_index=True, default='succeeded', max_length=16, verbose_name='Статус платежа'),
+        ),
+        migrations.AlterField(
+            model_name='subscriptionpayment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает оплаты'), ('succeeded', 'Оплачен'), ('canceled', 'Отменён')], db_index=True, default='pending', max_length=16, verbose_name='Статус платежа'),
+        ),
+        migrations.AddField(
+            model_name='subscriptionpayment',
+            name='subscription_data',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Данные оформления подписки'),
+        ),
+        migrations.AlterField(
+            model_name='subscriptionpayment',
+            name='subscription',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, to='planner.usersubscription'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_subscriptionpayment_status_and_more'),
+        ('planner', '0017_dish_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subscriptionpayment',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='payments', to='planner.usersubscription'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:21
+
+from datetime import UTC, datetime, time
+
+from django.db import migrations, models
+
+
+def fill_paid_at(apps, schema_editor):
+    # Точное время оплаты у старых платежей не сохранилось, берётся последняя известная дата платежа
+    SubscriptionPayment = apps.get_model('payments', 'SubscriptionPayment')
+    payments = SubscriptionPayment.objects.filter(status='succeeded', paid_at=None)
+    for payment in payments.only('pk', 'created_at').iterator():
+        payment.paid_at = datetime.combine(payment.created_at, time.min, tzinfo=UTC)
+        payment.save(update_fields=['paid_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_subscriptionpayment_subscription_renewals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscriptionpayment',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Заполняется при активации подписки по успешному платежу', null=True, verbose_name='Дата оплаты'),
+        ),
+        migrations.RunPython(fill_paid_at, migrations.RunPython.noop),
+    ]
@@ -8,6 +8,12 @@ class PaymentProviderChoices(models.TextChoices):
     YOOKASSA = 'yookassa', 'ЮKassa'
 
 
+class PaymentStatusChoices(models.TextChoices):
+    PENDING = 'pending', 'Ожидает оплаты'
+    SUCCEEDED = 'succeeded', 'Оплачен'
+    CANCELED = 'canceled', 'Отменён'
+
+
 class SubscriptionPayment(models.Model):
     payment_id = models.CharField(
         'Идентификатор платежа',
@@ -19,9 +25,24 @@ class SubscriptionPayment(models.Model):
         on_delete=models.RESTRICT,
         related_name='payments',
     )
-    subscription = models.OneToOneField(
+    subscription = models.ForeignKey(
         UserSubscription,
         on_delete=models.RESTRICT,
+        null=True,
+        blank=True,
+        related_name='payments',
+    )
+    subscription_data = models.JSONField(
+        'Данные оформления подписки',
+        default=dict,
+        blank=True,
+    )
+    status = models.CharField(
+        'Статус платежа',
+        max_length=16,
+        choices=PaymentStatusChoices.choices,
+        default=PaymentStatusChoices.PENDING,
+        db_index=True,
     )
     provider = models.CharField(
         'Платежный провайдер',
@@ -42,6 +63,13 @@ class SubscriptionPayment(models.Model):
         'Дата платежа',
         auto_now=True,
     )
+    paid_at = models.DateTimeField(
+        'Дата оплаты',
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text='Заполняется при активации подписки по успешному платежу',
+    )
 
     class Meta:
         verbose_name = 'Платеж за подписку'
@@ -0,0 +1,70 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from monitoring.metrics import SUBSCRIPTION_ACTIVATIONS
+from payments.models import PaymentStatusChoices, SubscriptionPayment
+from planner.models import UserSubscription
+from planner.services import create_subscription
+
+logger = logging.getLogger(__name__)
+
+
+def activate_payment(payment_id: str) -> SubscriptionPayment:
+    with transaction.atomic():
+        payment = (
+            SubscriptionPayment.objects
+            .select_for_update()
+            .select_related('user')
+            .get(payment_id=payment_id)
+        )
+        if payment.status == PaymentStatusChoices.SUCCEEDED:
+            return payment
+
+        payment.subscription = create_subscription(payment.user, payment.subscription_data)
+        payment.status = PaymentStatusChoices.SUCCEEDED
+        payment.paid_at = timezone.now()
+        payment.save(update_fields=['subscription', 'status', 'paid_at'])
+
+    SUBSCRIPTION_ACTIVATIONS.inc()
+    logger.info('Payment %s succeeded, subscription %s activated', payment_id, payment.subscription_id)
+    return payment
+
+
+def cancel_payment(payment_id: str) -> SubscriptionPayment:
+    payment = SubscriptionPayment.objects.get(payment_id=payment_id)
+    SubscriptionPayment.objects.filter(
+        pk=payment.pk,
+        status=PaymentStatusChoices.PENDING,
+    ).update(status=PaymentStatusChoices.CANCELED)
+    payment.refresh_from_db(fields=['status'])
+    return payment
+
+
+def apply_payment_status(payment_id: str, status: str) -> SubscriptionPayment | None:
+    if status == PaymentStatusChoices.SUCCEEDED:
+        return activate_payment(payment_id)
+    if status == PaymentStatusChoices.CANCELED:
+        return cancel_payment(payment_id)
+    return None
+
+
+def suspend_failed_payments(payment_pks: list[int]) -> int:
+    with transaction.atomic():
+        payments = SubscriptionPayment.objects.filter(pk__in=payment_pks)
+        # У подписки может быть несколько платежей: если текущий период оплачен другим успешным
+        # платежом (например, продлением), отмена одного из них подписку не приостанавливает
+        paid_for_current_period = SubscriptionPayment.objects.filter(
+            subscription=OuterRef('pk'),
+            status=PaymentStatusChoices.SUCCEEDED,
+            paid_at__date__gte=OuterRef('start_date'),
+        ).exclude(pk__in=payment_pks)
+        suspended = UserSubscription.objects.filter(
+            pk__in=payments.exclude(subscription=None).values('subscription_id'),
+        ).exclude(
+            Exists(paid_for_current_period),
+        ).update(is_suspended=True, updated_at=timezone.now())
+        payments.update(status=PaymentStatusChoices.CANCELED)
+    return suspended
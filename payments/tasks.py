@@ -0,0 +1,36 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from payments.gateway import get_gateway
+from payments.services import apply_payment_status
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PAYMENTS_WORKER_THREADS,
+            thread_name_prefix='payments',
+        )
+    return _executor
+
+
+def check_payment(payment_id: str):
+    try:
+        provider_payment = get_gateway().get_payment(payment_id)
+        apply_payment_status(payment_id, provider_payment.status)
+    except Exception:
+        logger.exception('Payment %s check failed', payment_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue_payment_check(payment_id: str):
+    transaction.on_commit(lambda: _get_executor().submit(check_payment, payment_id))
@@ -1,2 +1,356 @@
+import io
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from yookassa import Configuration
+
+from payments.gateway import GatewayPayment, PaymentGateway, PaymentGatewayError, get_gateway
+from payments.models import PaymentStatusChoices, SubscriptionPayment
+from payments.services import activate_payment, suspend_failed_payments
+from payments.yookassa_stub import YookassaStubServer
+from planner.models import SubscriptionPlan, UserSubscription
+
+User = get_user_model()
+
+SUBSCRIPTION_DATA = {
+    'foodtype': 'classic',
+    'term': '1',
+    'persons': '2',
+    'breakfast': True,
+    'lunch': True,
+    'dinner': False,
+    'dessert': False,
+    'allergies': [],
+    'description': 'Подписка FoodPlan на 1 месяц',
+    'total_price': 1000.0,
+}
+
+
+class YookassaStubTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = YookassaStubServer(('127.0.0.1', 0))
+        threading.Thread(target=cls.stub.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            PAYMENT_GATEWAY='payments.gateway.YookassaGateway',
+            YOOKASSA_API_URL=f'{cls.stub.base_url}/v3',
+            YOOKASSA_SHOP_ID='stub',
+            YOOKASSA_SECRET_KEY='stub',
+            YOOKASSA_WEBHOOK_CHECK_IP=False,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.stub.shutdown()
+        cls.stub.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        get_gateway.cache_clear()
+        self.addCleanup(get_gateway.cache_clear)
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.client.force_login(self.user)
+
+    def start_payment(self, subscription_data=SUBSCRIPTION_DATA):
+        session = self.client.session
+        session['pending_subscription'] = subscription_data
+        session.pop('yookassa_idempotency_key', None)
+        session.save()
+        response = self.client.get(reverse('yookassa_payment'))
+        self.assertTrue(response['Location'].startswith(self.stub.base_url))
+        return SubscriptionPayment.objects.get(payment_id=self.client.session['yookassa_payment_id'])
+
+    def send_webhook(self, payment_id, status=PaymentStatusChoices.SUCCEEDED):
+        payment = self.stub.finish_payment(payment_id, status)
+        with mock.patch('payments.services.SUBSCRIPTION_ACTIVATIONS') as activations:
+            response = self.client.post(
+                reverse('yookassa_webhook'),
+                data=json.dumps(self.stub.notification(payment)),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        return activations.inc.call_count
+
+
+class WebhookActivationTests(YookassaStubTestCase):
+    def test_repeated_webhook_activates_subscription_once(self):
+        payment = self.start_payment()
+
+        self.assertEqual(self.send_webhook(payment.payment_id), 1)
+        subscription = UserSubscription.objects.get(user=self.user)
+        end_date = subscription.end_date
+        paid_at = SubscriptionPayment.objects.get(pk=payment.pk).paid_at
+        self.assertIsNotNone(paid_at)
+
+        self.assertEqual(self.send_webhook(payment.payment_id), 0)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, PaymentStatusChoices.SUCCEEDED)
+        self.assertEqual(payment.subscription, subscription)
+        self.assertEqual(payment.paid_at, paid_at)
+        self.assertEqual(UserSubscription.objects.filter(user=self.user).count(), 1)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.end_date, end_date)
+
+    def test_duplicate_succeeded_event_after_background_check(self):
+        payment = self.start_payment()
+        self.send_webhook(payment.payment_id)
+
+        # Фоновая проверка платежа может прийти после уведомления с тем же статусом
+        activate_payment(payment.payment_id)
+
+        subscription = UserSubscription.objects.get(user=self.user)
+        self.assertEqual(subscription.end_date, timezone.now().date() + relativedelta(months=1))
+        self.assertEqual(subscription.payments.count(), 1)
+
+    def test_canceled_payment_does_not_activate(self):
+        payment = self.start_payment()
+
+        self.send_webhook(payment.payment_id, PaymentStatusChoices.CANCELED)
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, PaymentStatusChoices.CANCELED)
+        self.assertIsNone(payment.paid_at)
+        self.assertFalse(UserSubscription.objects.filter(user=self.user).exists())
+
+
+    def test_forged_notification_is_checked_with_gateway(self):
+        payment = self.start_payment()
+        forged = self.stub.notification({**self.stub.payments[payment.payment_id], 'status': 'succeeded'})
+
+        response = self.client.post(reverse('yookassa_webhook'), data=json.dumps(forged), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, PaymentStatusChoices.PENDING)
+        self.assertFalse(UserSubscription.objects.filter(user=self.user).exists())
+
+
+class SubscriptionRenewalTests(YookassaStubTestCase):
+    def create_subscription(self, end_date, **kwargs):
+        subscription = UserSubscription(
+            user=self.user,
+            diet_type='vegetarian',
+            plan=SubscriptionPlan.objects.get(duration=3),
+            end_date=end_date,
+            **kwargs,
+        )
+        subscription.selected_meal_types = ['dinner']
+        subscription.save()
+        return subscription
+
+    def test_payment_extends_active_subscription(self):
+        end_date = timezone.now().date() + timedelta(days=2)
+        subscription = self.create_subscription(end_date, renewal_reminder_sent_at=timezone.now().date())
+
+        payment = self.start_payment()
+        self.send_webhook(payment.payment_id)
+
+        subscription.refresh_from_db()
+        payment.refresh_from_db()
+        self.assertEqual(payment.subscription, subscription)
+        self.assertEqual(subscription.end_date, end_date + relativedelta(months=1))
+        self.assertEqual(subscription.diet_type, 'classic')
+        self.assertEqual(subscription.selected_meal_types, ['breakfast', 'lunch'])
+        self.assertEqual(subscription.persons_count, 2)
+        self.assertIsNone(subscription.renewal_reminder_sent_at)
+
+    def test_payment_restarts_expired_subscription(self):
+        subscription = self.create_subscription(timezone.now().date() - timedelta(days=10), is_suspended=True)
+
+        payment = self.start_payment()
+        self.send_webhook(payment.payment_id)
+
+        subscription.refresh_from_db()
+        self.assertFalse(subscription.is_suspended)
+        self.assertEqual(subscription.start_date, timezone.now().date())
+        self.assertEqual(subscription.end_date, timezone.now().date() + relativedelta(months=1))
+        self.assertEqual(SubscriptionPayment.objects.filter(subscription=subscription).count(), 1)
+
+
+class ProxyErrorHandler(BaseHTTPRequestHandler):
+    def respond(self):
+        self.server.idempotency_keys.append(self.headers.get('Idempotence-Key'))
+        time.sleep(self.server.delay)
+        body = b'<html><body>502 Bad Gateway</body></html>'
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GatewayErrorTests(YookassaStubTestCase):
+    def start_proxy(self, status=502, delay=0):
+        proxy = ThreadingHTTPServer(('127.0.0.1', 0), ProxyErrorHandler)
+        proxy.daemon_threads = True
+        proxy.idempotency_keys = []
+        proxy.status = status
+        proxy.delay = delay
+        threading.Thread(target=proxy.serve_forever, daemon=True).start()
+        self.addCleanup(proxy.server_close)
+        self.addCleanup(proxy.shutdown)
+        host, port = proxy.server_address[:2]
+        return proxy, f'http://{host}:{port}/v3'
+
+    def create_payment(self, idempotency_key='key'):
+        return get_gateway().create_payment(
+            amount=100,
+            description='Подписка',
+            return_url='http://testserver/',
+            customer={'email': 'buyer@example.com'},
+            metadata={},
+            idempotency_key=idempotency_key,
+        )
+
+    def test_unknown_payment_raises_gateway_error(self):
+        with self.assertRaises(PaymentGatewayError):
+            get_gateway().get_payment('missing')
+
+    def test_non_json_error_page_raises_gateway_error(self):
+        proxy, api_url = self.start_proxy()
+
+        with override_settings(YOOKASSA_API_URL=api_url):
+            get_gateway.cache_clear()
+            with self.assertRaises(PaymentGatewayError):
+                get_gateway().get_payment('any')
+            with self.assertRaises(PaymentGatewayError):
+                self.create_payment()
+        # Повторы POST после 502 отправляются с тем же ключом идемпотентности
+        self.assertEqual(
+            {key for key in proxy.idempotency_keys if key is not None},
+            {'key'},
+        )
+
+    def test_accepted_response_is_not_retried(self):
+        proxy, api_url = self.start_proxy(status=202)
+
+        with override_settings(YOOKASSA_API_URL=api_url):
+            get_gateway.cache_clear()
+            with self.assertRaises(PaymentGatewayError):
+                self.create_payment()
+        self.assertEqual(proxy.idempotency_keys, ['key'])
+
+    def test_retries_stop_at_total_timeout(self):
+        proxy, api_url = self.start_proxy(delay=0.3)
+
+        with override_settings(
+            YOOKASSA_API_URL=api_url,
+            PAYMENT_GATEWAY_READ_TIMEOUT=10,
+            PAYMENT_GATEWAY_RETRIES=10,
+            PAYMENT_GATEWAY_TOTAL_TIMEOUT=1,
+        ):
+            get_gateway.cache_clear()
+            started = time.monotonic()
+            with self.assertRaises(PaymentGatewayError):
+                get_gateway().get_payment('any')
+            elapsed = time.monotonic() - started
+        self.assertLess(elapsed, 1.5)
+        self.assertLess(len(proxy.idempotency_keys), 11)
+
+    def test_error_page_in_payment_view_redirects_to_order(self):
+        with override_settings(YOOKASSA_API_URL='http://127.0.0.1:9/v3'):
+            get_gateway.cache_clear()
+            session = self.client.session
+            session['pending_subscription'] = SUBSCRIPTION_DATA
+            session.save()
+            response = self.client.get(reverse('yookassa_payment'))
+        self.assertRedirects(response, reverse('order'), fetch_redirect_response=False)
+
+
+class GatewayConfigurationTests(YookassaStubTestCase):
+    def test_gateway_does_not_configure_sdk_globally(self):
+        get_gateway().get_payment(self.start_payment().payment_id)
+
+        self.assertIsNone(Configuration.account_id)
+        self.assertIsNone(Configuration.secret_key)
+        self.assertEqual(Configuration.api_url, 'https://api.yookassa.ru/v3')
+
+    async def test_async_methods(self):
+        gateway = get_gateway()
+
+        payment = await gateway.acreate_payment(
+            amount=100,
+            description='Подписка',
+            return_url='http://testserver/',
+            customer={'email': 'buyer@example.com'},
+            metadata={},
+            idempotency_key='async-key',
+        )
+        self.assertTrue(payment.confirmation_url.startswith(self.stub.base_url))
+
+        found = await gateway.aget_payment(payment.id)
+        self.assertEqual(found, GatewayPayment(payment.id, PaymentStatusChoices.PENDING))
+
+
+class BrokenPayloadGateway(PaymentGateway):
+    """Шлюз, у которого ответ по одному из платежей не разбирается."""
+
+    def create_payment(self, **kwargs):
+        raise NotImplementedError
+
+    def get_payment(self, payment_id):
+        if payment_id == 'broken':
+            raise KeyError('status')
+        return GatewayPayment(payment_id, PaymentStatusChoices.SUCCEEDED)
+
+
+class ReconcilePaymentsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password')
+
+    def create_payment(self, payment_id, status=PaymentStatusChoices.PENDING, **kwargs):
+        return SubscriptionPayment.objects.create(
+            payment_id=payment_id,
+            user=self.user,
+            subscription_data=SUBSCRIPTION_DATA,
+            status=status,
+            provider='yookassa',
+            amount=1000,
+            description='Подписка',
+            **kwargs,
+        )
+
+    def test_unexpected_error_does_not_abort_run(self):
+        self.create_payment('broken')
+        payment = self.create_payment('good')
+
+        stderr = io.StringIO()
+        with self.assertLogs('payments.management.commands.reconcile_payments', 'ERROR'):
+            call_command('reconcile_payments', gateway=f'{__name__}.BrokenPayloadGateway', stdout=io.StringIO(),
+                         stderr=stderr)
+
+        self.assertIn('broken', stderr.getvalue())
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, PaymentStatusChoices.SUCCEEDED)
+        self.assertTrue(UserSubscription.objects.filter(user=self.user).exists())
+
+    def test_failed_payment_does_not_suspend_renewed_subscription(self):
+        activate_payment(self.create_payment('first').payment_id)
+        renewal = activate_payment(self.create_payment('renewal').payment_id)
+
+        self.assertEqual(suspend_failed_payments([renewal.pk]), 0)
+        self.assertFalse(UserSubscription.objects.get(user=self.user).is_suspended)
+
+    def test_failed_only_payment_suspends_subscription(self):
+        payment = activate_payment(self.create_payment('only').payment_id)
+
+        self.assertEqual(suspend_failed_payments([payment.pk]), 1)
+        self.assertTrue(UserSubscription.objects.get(user=self.user).is_suspended)
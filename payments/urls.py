@@ -5,4 +5,5 @@ from . import views
 urlpatterns = [
     path('yookassa/', views.YookassaPaymentView.as_view(), name='yookassa_payment'),
     path('yookassa/success/', views.YookassaSuccessView.as_view(), name='yookassa_success'),
+    path('yookassa/webhook/', views.YookassaWebhookView.as_view(), name='yookassa_webhook'),
 ]
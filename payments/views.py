@@ -1,82 +1,121 @@
-import os
+import json
+import time
 import uuid
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import View
-from yookassa import Configuration, Payment
+from django.views.decorators.csrf import csrf_exempt
+from yookassa.domain.common import SecurityHelper
 
-from payments.models import PaymentProviderChoices, SubscriptionPayment
-from planner.views import create_subscription
+from monitoring.metrics import PAYMENT_CREATION_SECONDS
+from payments.gateway import PaymentGatewayError, get_gateway
+from payments.models import PaymentProviderChoices, PaymentStatusChoices, SubscriptionPayment
+from payments.services import apply_payment_status
+from payments.tasks import enqueue_payment_check
+
+WEBHOOK_EVENTS = {'payment.succeeded', 'payment.canceled'}
 
 
 class YookassaPaymentView(LoginRequiredMixin, View):
     def get(self, request):
-        Configuration.account_id = os.getenv('YOOKASSA_SHOP_ID')
-        Configuration.secret_key = os.getenv('YOOKASSA_SECRET_KEY')
-        payment_id = str(uuid.uuid4())
-        request.session['yookassa_payment_id'] = payment_id
-
-        subscription_data = request.session['pending_subscription']
-        payment = Payment.create(
-            params={
-                'amount': {
-                    'value': subscription_data['total_price'],
-                    'currency': 'RUB',
-                },
-                'confirmation': {
-                    'type': 'redirect',
-                    'return_url': request.build_absolute_uri(reverse('yookassa_success')),
+        subscription_data = request.session.get('pending_subscription')
+        if not subscription_data:
+            messages.error(request, 'Данные подписки не найдены.', extra_tags='danger')
+            return redirect('order')
+
+        # Повторный заход на страницу оплаты вернёт тот же платёж, а не создаст новый
+        idempotency_key = request.session.setdefault('yookassa_idempotency_key', str(uuid.uuid4()))
+        started = time.perf_counter()
+        try:
+            payment = get_gateway().create_payment(
+                amount=subscription_data['total_price'],
+                description=f'{subscription_data["description"]}',
+                return_url=request.build_absolute_uri(reverse('yookassa_success')),
+                customer={
+                    'username': f'{request.user.username}',
+                    'email': f'{request.user.email}',
                 },
-                'capture': True,
-                'description': f'{subscription_data["description"]}',
-                'metadata': {
+                metadata={
                     'user_id': request.user.id,
                 },
-                'receipt': {
-                    'customer': {
-                        'username': f'{request.user.username}',
-                        'email': f'{request.user.email}',
-                    },
-                },
+                idempotency_key=idempotency_key,
+            )
+        except PaymentGatewayError:
+            PAYMENT_CREATION_SECONDS.labels(outcome='error').observe(time.perf_counter() - started)
+            messages.error(request, 'Платёжный сервис временно недоступен, попробуйте позже.', extra_tags='danger')
+            return redirect('order')
+        PAYMENT_CREATION_SECONDS.labels(outcome='ok').observe(time.perf_counter() - started)
+
+        SubscriptionPayment.objects.get_or_create(
+            payment_id=payment.id,
+            defaults={
+                'user': request.user,
+                'provider': PaymentProviderChoices.YOOKASSA,
+                'amount': subscription_data['total_price'],
+                'description': subscription_data['description'],
+                'subscription_data': subscription_data,
             },
-            idempotency_key=payment_id,
         )
+        request.session['yookassa_payment_id'] = payment.id
 
-        return redirect(payment.confirmation.confirmation_url)
+        return redirect(payment.confirmation_url)
 
 
-class YookassaSuccessView(View):
+class YookassaSuccessView(LoginRequiredMixin, View):
     def get(self, request):
         payment_id = request.session.get('yookassa_payment_id')
-        subscription_data = request.session.get('pending_subscription')
-
-        if not payment_id or not subscription_data:
-            messages.error(request, 'Данные платежа не найдены.')
+        payment = SubscriptionPayment.objects.filter(payment_id=payment_id, user=request.user).first()
+        if not payment_id or not payment:
+            messages.error(request, 'Данные платежа не найдены.', extra_tags='danger')
             return redirect('order')
 
-        try:
-            # Здесь проверка платежа в демо не работает
-            # payment = Payment.find_one(payment_id)
-            # if payment.status != 'succeeded':
-            #     messages.error(request, f'Платёж не прошёл: {payment.status}', extra_tags='danger')
-            #     return redirect('order')
-            subscription = create_subscription(request.user, subscription_data)
-            SubscriptionPayment.objects.create(
-                payment_id=payment_id,
-                user=request.user,
-                subscription=subscription,
-                provider=PaymentProviderChoices.YOOKASSA,
-                amount=subscription.total_price,
-                description=subscription_data['description'],
-            )
-            del request.session['yookassa_payment_id']
-            del request.session['pending_subscription']
+        request.session.pop('yookassa_payment_id', None)
+        request.session.pop('yookassa_idempotency_key', None)
+        request.session.pop('pending_subscription', None)
 
+        if payment.status == PaymentStatusChoices.SUCCEEDED:
             messages.success(request, '✅ Оплата прошла успешно! Подписка активирована.')
             return redirect('profile')
-        except Exception as exc:
-            messages.error(request, f'Ошибка создания подписки: {str(exc)}', extra_tags='danger')
+        if payment.status == PaymentStatusChoices.CANCELED:
+            messages.error(request, 'Платёж не прошёл.', extra_tags='danger')
             return redirect('order')
+
+        # Подписку активирует уведомление от ЮKassa, а если оно задержится - фоновая проверка платежа
+        enqueue_payment_check(payment.payment_id)
+        messages.info(request, 'Платёж обрабатывается. Подписка будет активирована после подтверждения оплаты.')
+        return redirect('profile')
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class YookassaWebhookView(View):
+    def post(self, request):
+        if settings.YOOKASSA_WEBHOOK_CHECK_IP and not SecurityHelper().is_ip_trusted(request.META['REMOTE_ADDR']):
+            return HttpResponseForbidden()
+
+        try:
+            notification = json.loads(request.body)
+            event = notification['event']
+            payment_id = notification['object']['id']
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return JsonResponse({'error': 'Неверный формат уведомления'}, status=400)
+
+        if event not in WEBHOOK_EVENTS:
+            return JsonResponse({'status': 'ignored'})
+        if not SubscriptionPayment.objects.filter(payment_id=payment_id).exists():
+            return JsonResponse({'error': 'Платёж не найден'}, status=404)
+
+        # Телу уведомления не доверяем: статус платежа запрашивается у ЮKassa, как и при сверке.
+        # Поэтому проверку IP можно отключить, если запросы приходят через обратный прокси
+        try:
+            provider_payment = get_gateway().get_payment(payment_id)
+        except PaymentGatewayError:
+            # ЮKassa повторит уведомление, если не получит ответ 200
+            return JsonResponse({'error': 'Платёжный сервис недоступен'}, status=503)
+        apply_payment_status(payment_id, provider_payment.status)
+        return JsonResponse({'status': 'ok'})
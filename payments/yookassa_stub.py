@@ -0,0 +1,141 @@
+"""Локальная замена API ЮKassa для разработки и тестов.
+
+Поддерживает создание и получение платежей, а также страницу подтверждения
+оплаты, после которой отправляет уведомление на адрес вебхука.
+"""
+import json
+import logging
+import re
+import threading
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_PATH = re.compile(r'^/v3/payments/(?P<payment_id>[\w-]+)$')
+CONFIRM_PATH = re.compile(r'^/confirm/(?P<payment_id>[\w-]+)$')
+
+
+class YookassaStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, webhook_url=None):
+        super().__init__(server_address, YookassaStubHandler)
+        self.webhook_url = webhook_url
+        self.payments = {}
+        self.idempotency_keys = {}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def create_payment(self, params, idempotency_key):
+        with self.lock:
+            if idempotency_key in self.idempotency_keys:
+                return self.payments[self.idempotency_keys[idempotency_key]]
+            payment_id = str(uuid.uuid4())
+            payment = {
+                'id': payment_id,
+                'status': 'pending',
+                'paid': False,
+                'amount': params['amount'],
+                'description': params.get('description', ''),
+                'metadata': params.get('metadata', {}),
+                'recipient': {'account_id': 'stub', 'gateway_id': 'stub'},
+                'created_at': timezone.now().isoformat(),
+                'confirmation': {
+                    'type': 'redirect',
+                    'return_url': params.get('confirmation', {}).get('return_url', ''),
+                    'confirmation_url': f'{self.base_url}/confirm/{payment_id}',
+                },
+                'test': True,
+                'refundable': False,
+            }
+            self.payments[payment_id] = payment
+            if idempotency_key:
+                self.idempotency_keys[idempotency_key] = payment_id
+            return payment
+
+    def finish_payment(self, payment_id, status):
+        with self.lock:
+            payment = self.payments[payment_id]
+            payment['status'] = status
+            payment['paid'] = status == 'succeeded'
+        if self.webhook_url:
+            self.send_notification(payment)
+        return payment
+
+    def notification(self, payment):
+        return {
+            'type': 'notification',
+            'event': f'payment.{payment["status"]}',
+            'object': payment,
+        }
+
+    def send_notification(self, payment):
+        body = json.dumps(self.notification(payment)).encode()
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=body,
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                logger.info('Webhook for %s delivered: %s', payment['id'], response.status)
+        except OSError as error:
+            logger.warning('Webhook for %s failed: %s', payment['id'], error)
+
+
+class YookassaStubHandler(BaseHTTPRequestHandler):
+    server: YookassaStubServer
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_found(self):
+        self.send_json({
+            'type': 'error',
+            'id': str(uuid.uuid4()),
+            'code': 'not_found',
+            'description': 'Payment not found',
+        }, status=404)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/v3/payments':
+            return self.send_not_found()
+        length = int(self.headers.get('Content-Length', 0))
+        params = json.loads(self.rfile.read(length) or b'{}')
+        payment = self.server.create_payment(params, self.headers.get('Idempotence-Key'))
+        self.send_json(payment)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if match := PAYMENT_PATH.match(url.path):
+            payment = self.server.payments.get(match['payment_id'])
+            return self.send_json(payment) if payment else self.send_not_found()
+
+        if match := CONFIRM_PATH.match(url.path):
+            if match['payment_id'] not in self.server.payments:
+                return self.send_not_found()
+            status = parse_qs(url.query).get('status', ['succeeded'])[0]
+            payment = self.server.finish_payment(match['payment_id'], status)
+            self.send_response(302)
+            self.send_header('Location', payment['confirmation']['return_url'])
+            self.end_headers()
+            return None
+
+        return self.send_not_found()
+
+    def log_message(self, format, *args):
+        logger.info(format, *args)
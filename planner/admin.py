@@ -1,42 +1,164 @@
-from django.contrib import admin
-
+import json
+from decimal import Decimal
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from planner.catalog import export_dishes, import_dishes
+from planner.forms import DishActionForm, DishImportForm, IngredientAdminForm, UserSubscriptionAdminForm
 from planner.models import (
+    DIET_TYPE_EXCLUDED_TAGS,
+    DISH_TEXT_FIELDS,
     Allergy,
     DailyMeal,
     DailyMenu,
+    DietTagChoices,
+    DietTypeChoices,
     Dish,
     DishIngredient,
     Ingredient,
+    MealTypeChoices,
     SubscriptionPlan,
     UserProfile,
     UserSubscription,
+    masks_with_diet_tag,
 )
 
 
+class DeferredFieldsChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        return queryset.defer(*self.model_admin.changelist_deferred_fields)
+
+
+class DeferredFieldsAdminMixin:
+    # Поля, которые не выводятся в списке объектов и не загружаются для него;
+    # форма редактирования по-прежнему получает объект целиком
+    changelist_deferred_fields = ()
+
+    def get_changelist(self, request, **kwargs):
+        return DeferredFieldsChangeList
+
+
+class AutocompleteListFilter(admin.SimpleListFilter):
+    """Фильтр по внешнему ключу с поиском вместо списка всех значений."""
+
+    template = 'admin/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.parameter_name = f'{self.field_name}__id__exact'
+        field = model._meta.get_field(self.field_name)
+        self.target_field = field.target_field
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={'style': 'width: 100%'}),
+            required=False,
+        )
+        super().__init__(request, params, model, model_admin)
+
+    @classmethod
+    def widget_media(cls, model, admin_site):
+        return AutocompleteSelect(model._meta.get_field(cls.field_name), admin_site).media
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        # Как и встроенные фильтры, неверное значение из адреса показывает ошибку в списке, а не 500
+        try:
+            return queryset.filter(**{self.parameter_name: self.target_field.to_python(self.value())})
+        except (ValueError, ValidationError) as error:
+            raise IncorrectLookupParameters(error)
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is not None,
+            'parameter_name': self.parameter_name,
+            'rendered': self.form_field.widget.render(self.parameter_name, self.value()),
+            'reset_url': changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+
+class DailyMenuUserFilter(AutocompleteListFilter):
+    title = 'Пользователь'
+    field_name = 'user'
+
+
+class DailyMealMenuFilter(AutocompleteListFilter):
+    title = 'Дневное меню'
+    field_name = 'daily_menu'
+
+
 class DailyMealInline(admin.TabularInline):
     model = DailyMeal
     extra = 1
     fields = ('meal_type', 'dish')
+    autocomplete_fields = ('dish',)
 
 
 @admin.register(DailyMenu)
 class DailyMenuAdmin(admin.ModelAdmin):
     list_display = ('user', 'date', 'meals_count', 'total_calories')
-    list_filter = ('date', 'user')
-    search_fields = ('user__username',)
+    list_filter = (DailyMenuUserFilter,)
+    list_select_related = ('user',)
+    date_hierarchy = 'date'
+    search_fields = ('^user__username', '=user__email')
     readonly_fields = ('total_calories', 'total_cooking_time')
+    autocomplete_fields = ('user',)
+    show_full_result_count = False
     inlines = [DailyMealInline]
 
+    @property
+    def media(self):
+        return super().media + DailyMenuUserFilter.widget_media(self.model, self.admin_site)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
     def meals_count(self, obj):
-        return obj.meals.count()
+        return obj.annotated_meals_count
     meals_count.short_description = 'Приемов пищи'
+    meals_count.admin_order_field = 'annotated_meals_count'
+
+    def total_calories(self, obj):
+        return obj.annotated_calories.quantize(Decimal('0.01'))
+    total_calories.short_description = 'Калории'
+    total_calories.admin_order_field = 'annotated_calories'
 
 
 @admin.register(DailyMeal)
-class DailyMealAdmin(admin.ModelAdmin):
+class DailyMealAdmin(DeferredFieldsAdminMixin, admin.ModelAdmin):
     list_display = ('daily_menu', 'meal_type', 'dish')
-    list_filter = ('meal_type', 'daily_menu__date')
-    search_fields = ('daily_menu__user__username', 'dish__name')
+    # Фильтр по меню идёт по индексу daily_menu_id, без соединения с таблицей меню
+    list_filter = ('meal_type', DailyMealMenuFilter)
+    list_select_related = ('daily_menu__user', 'dish')
+    changelist_deferred_fields = tuple(f'dish__{field}' for field in DISH_TEXT_FIELDS)
+    search_fields = ('^daily_menu__user__username', '^dish__name')
+    autocomplete_fields = ('daily_menu', 'dish')
+    show_full_result_count = False
+    # Сортировка по первичному ключу идёт по индексу, а не по всей таблице
+    ordering = ('-pk',)
+
+    @property
+    def media(self):
+        return super().media + DailyMealMenuFilter.widget_media(self.model, self.admin_site)
 
 
 class DishIngredientInline(admin.TabularInline):
@@ -44,15 +166,71 @@ class DishIngredientInline(admin.TabularInline):
     extra = 1
     fields = ('ingredient', 'quantity', 'total_calories')
     readonly_fields = ('total_calories',)
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
+
+
+class DishDietFitFilter(admin.SimpleListFilter):
+    title = 'Соответствие типу меню'
+    parameter_name = 'fits_diet_type'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('yes', 'Соответствует'),
+            ('no', 'Не соответствует'),
+        )
+
+    def queryset(self, request, queryset):
+        not_fitting = Dish.objects.not_fitting_diet_type().values('pk')
+        if self.value() == 'yes':
+            return queryset.exclude(pk__in=not_fitting)
+        if self.value() == 'no':
+            return queryset.filter(pk__in=not_fitting)
+        return queryset
+
+
+class DishDietCompatibilityFilter(admin.SimpleListFilter):
+    title = 'Подходит для меню'
+    parameter_name = 'compatible_with'
+
+    def lookups(self, request, model_admin):
+        return [(diet_type.value, diet_type.label) for diet_type in DIET_TYPE_EXCLUDED_TAGS]
+
+    def queryset(self, request, queryset):
+        if self.value() in DIET_TYPE_EXCLUDED_TAGS:
+            return queryset.compatible_with(self.value())
+        return queryset
+
+
+class DietTagFilter(admin.SimpleListFilter):
+    title = 'Пищевая метка'
+    parameter_name = 'diet_tag'
+
+    def lookups(self, request, model_admin):
+        return DietTagChoices.choices
+
+    def queryset(self, request, queryset):
+        if self.value() in DietTagChoices.values:
+            return queryset.filter(diet_tags_mask__in=masks_with_diet_tag(self.value()))
+        return queryset
 
 
 @admin.register(Dish)
-class DishAdmin(admin.ModelAdmin):
-    list_display = ('name', 'diet_type', 'category', 'cooking_time', 'difficulty', 'total_calories',
-                    'calories_per_portion')
-    list_filter = ('diet_type', 'category', 'difficulty')
+class DishAdmin(DeferredFieldsAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'diet_type', 'category', 'cooking_time', 'difficulty', 'calories',
+                    'calories_per_portion', 'protein', 'fat', 'carbs', 'fits_diet_type')
+    list_filter = ('diet_type', 'category', 'difficulty', DishDietFitFilter, DishDietCompatibilityFilter,
+                   DietTagFilter)
     search_fields = ('name', 'description')
-    readonly_fields = ('total_calories', 'calories_per_portion', 'is_vegetarian')
+    readonly_fields = ('total_calories', 'calories_per_portion', 'protein', 'fat', 'carbs', 'carbs_energy_share',
+                       'fits_diet_type', 'diet_tags', 'is_vegetarian')
+    show_full_result_count = False
+    changelist_deferred_fields = DISH_TEXT_FIELDS
+    action_form = DishActionForm
+    actions = ('set_diet_type', 'set_category', 'scale_ingredients', 'recalculate_nutrition', 'export_to_json')
+    change_list_template = 'admin/planner/dish/change_list.html'
     fieldsets = (
         ('Основная информация', {
             'fields': ('name', 'description', 'photo', 'diet_type', 'category'),
@@ -61,31 +239,175 @@ class DishAdmin(admin.ModelAdmin):
             'fields': ('recipe', 'cooking_time', 'difficulty', 'portions'),
         }),
         ('Расчеты', {
-            'fields': ('total_calories', 'calories_per_portion', 'is_vegetarian'),
+            'fields': ('total_calories', 'calories_per_portion', 'protein', 'fat', 'carbs', 'carbs_energy_share',
+                       'fits_diet_type', 'diet_tags', 'is_vegetarian'),
             'classes': ('collapse',),
         }),
     )
     inlines = [DishIngredientInline]
 
+    def get_urls(self):
+        return [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_view),
+                name='planner_dish_import',
+            ),
+        ] + super().get_urls()
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        dish = Dish.objects.only('diet_type', 'calories', 'carbs').get(pk=form.instance.pk)
+        if not dish.fits_diet_type:
+            self.message_user(
+                request,
+                f'Доля углеводов в блюде «{form.instance}» ({dish.carbs_energy_share:.0%}) '
+                f'превышает допустимую для типа меню «{dish.get_diet_type_display()}».',
+                messages.WARNING,
+            )
+
+    def calories_per_portion(self, obj):
+        if obj.portions > 0:
+            return (obj.calories / obj.portions).quantize(Decimal('0.01'))
+        return Decimal('0')
+
+    calories_per_portion.short_description = 'Калории на порцию'
+
+    def carbs_energy_share(self, obj):
+        return f'{obj.carbs_energy_share:.0%}'
+
+    carbs_energy_share.short_description = 'Доля энергии из углеводов'
+
+    def fits_diet_type(self, obj):
+        return obj.fits_diet_type
+
+    fits_diet_type.short_description = 'Соответствует типу меню'
+    fits_diet_type.boolean = True
+
+    def diet_tags(self, obj):
+        return ', '.join(DietTagChoices(tag).label for tag in obj.diet_tags) or '—'
+
+    diet_tags.short_description = 'Пищевые метки'
+
+    def is_vegetarian(self, obj):
+        return obj.is_vegetarian
+
+    is_vegetarian.short_description = 'Вегетарианское'
+    is_vegetarian.boolean = True
+
+    def set_diet_type(self, request, queryset):
+        diet_type = request.POST.get('diet_type')
+        if diet_type not in DietTypeChoices.values:
+            self.message_user(request, 'Выберите тип меню.', messages.ERROR)
+            return
+        updated = queryset.update(diet_type=diet_type, updated_at=timezone.now())
+        self.message_user(request, f'Тип меню изменён у блюд: {updated}.')
+
+    set_diet_type.short_description = 'Изменить тип меню'
+
+    def set_category(self, request, queryset):
+        category = request.POST.get('category')
+        if category not in MealTypeChoices.values:
+            self.message_user(request, 'Выберите категорию.', messages.ERROR)
+            return
+        updated = queryset.update(category=category, updated_at=timezone.now())
+        self.message_user(request, f'Категория изменена у блюд: {updated}.')
+
+    set_category.short_description = 'Изменить категорию'
+
+    def scale_ingredients(self, request, queryset):
+        try:
+            factor = DishActionForm.base_fields['factor'].clean(request.POST.get('factor'))
+        except ValidationError:
+            factor = None
+        if not factor:
+            self.message_user(request, 'Укажите положительный коэффициент.', messages.ERROR)
+            return
+        dish_ids = list(queryset.values_list('pk', flat=True))
+        with transaction.atomic():
+            updated = DishIngredient.objects.filter(dish__in=dish_ids).update(
+                quantity=F('quantity') * factor,
+                base_quantity=F('base_quantity') * factor,
+            )
+            Dish.objects.filter(pk__in=dish_ids).recalculate_nutrition()
+        self.message_user(request, f'Количество изменено у ингредиентов: {updated}.')
+
+    scale_ingredients.short_description = 'Масштабировать количество ингредиентов'
+
+    def recalculate_nutrition(self, request, queryset):
+        updated = Dish.objects.filter(pk__in=queryset.values('pk')).recalculate_nutrition()
+        self.message_user(request, f'Пищевая ценность и метки пересчитаны у блюд: {updated}.')
+
+    recalculate_nutrition.short_description = 'Пересчитать пищевую ценность и метки'
+
+    def export_to_json(self, request, queryset):
+        response = JsonResponse(export_dishes(queryset), safe=False, json_dumps_params={'ensure_ascii': False})
+        response['Content-Disposition'] = 'attachment; filename="dishes.json"'
+        return response
+
+    export_to_json.short_description = 'Экспортировать в JSON'
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = DishImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            try:
+                imported = import_dishes(json.load(form.cleaned_data['file']))
+            except (ValueError, ValidationError) as error:
+                form.add_error('file', str(error))
+            else:
+                self.message_user(request, f'Импортировано блюд: {imported}.')
+                return redirect('admin:planner_dish_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': 'Импорт блюд из JSON',
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/planner/dish/import.html', context)
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
-    list_display = ('name', 'calories', 'unit', 'allergens_list')
-    list_filter = ('unit', 'allergens')
+    form = IngredientAdminForm
+    list_display = ('name', 'calories', 'protein', 'fat', 'carbs', 'nutrition_basis', 'diet_tags', 'allergens_list')
+    list_filter = ('unit', DietTagFilter, 'allergens')
     search_fields = ('name',)
     filter_horizontal = ('allergens',)
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('allergens')
 
     def allergens_list(self, obj):
         return ", ".join([allergy.name for allergy in obj.allergens.all()])
 
     allergens_list.short_description = 'Аллергены'
 
+    def diet_tags(self, obj):
+        return ', '.join(DietTagChoices(tag).label for tag in obj.diet_tags) or '—'
+
+    diet_tags.short_description = 'Пищевые метки'
+
+    def nutrition_basis(self, obj):
+        return obj.get_nutrition_basis_display()
+
+    nutrition_basis.short_description = 'Пищевая ценность указана'
+    nutrition_basis.admin_order_field = 'unit'
+
 
 @admin.register(DishIngredient)
-class DishIngredientAdmin(admin.ModelAdmin):
+class DishIngredientAdmin(DeferredFieldsAdminMixin, admin.ModelAdmin):
     list_display = ('dish', 'ingredient', 'quantity', 'unit_display', 'total_calories')
     list_filter = ('dish__diet_type', 'dish__category', 'ingredient__allergens')
+    list_select_related = ('dish', 'ingredient')
+    changelist_deferred_fields = tuple(f'dish__{field}' for field in DISH_TEXT_FIELDS)
     search_fields = ('dish__name', 'ingredient__name')
+    autocomplete_fields = ('dish', 'ingredient')
+    show_full_result_count = False
 
     def unit_display(self, obj):
         return obj.ingredient.get_unit_display()
@@ -101,19 +423,67 @@ class DishIngredientAdmin(admin.ModelAdmin):
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user',)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+
+
+class SubscriptionActiveFilter(admin.SimpleListFilter):
+    title = 'Активна'
+    parameter_name = 'active'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('yes', 'Да'),
+            ('no', 'Нет'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.active()
+        if self.value() == 'no':
+            return queryset.inactive()
+        return queryset
+
+
+class SubscriptionMealTypeFilter(admin.SimpleListFilter):
+    title = 'Приём пищи'
+    parameter_name = 'meal_type'
+
+    def lookups(self, request, model_admin):
+        return MealTypeChoices.choices
+
+    def queryset(self, request, queryset):
+        if self.value() in MealTypeChoices.values:
+            return queryset.with_meal_type(self.value())
+        return queryset
 
 
 @admin.register(UserSubscription)
 class UserSubscriptionAdmin(admin.ModelAdmin):
+    form = UserSubscriptionAdminForm
     list_display = ('user', 'diet_type', 'plan', 'persons_count', 'start_date', 'end_date', 'is_active')
-    list_filter = ('plan', 'diet_type', 'start_date')
+    list_filter = (
+        SubscriptionActiveFilter,
+        SubscriptionMealTypeFilter,
+        'plan',
+        'diet_type',
+        'start_date',
+        'is_suspended',
+    )
+    list_select_related = ('user', 'plan')
+    autocomplete_fields = ('user',)
+    show_full_result_count = False
     ordering = ('end_date',)
     filter_horizontal = ('allergies',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_active_flag()
+
     def is_active(self, obj):
-        return obj.is_active
+        return obj.active_now
 
     is_active.boolean = True
+    is_active.admin_order_field = 'active_now'
     is_active.short_description = 'Активна'
 
 
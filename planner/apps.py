@@ -5,3 +5,6 @@ class PlannerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'planner'
     verbose_name = 'Планер питания'
+
+    def ready(self):
+        from planner import signals  # noqa: F401
@@ -0,0 +1,132 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from planner.models import (
+    NUTRIENT_FIELDS,
+    DietTagChoices,
+    Dish,
+    DishIngredient,
+    Ingredient,
+    diet_tags_to_mask,
+    mask_to_diet_tags,
+)
+from planner.search import index_dishes
+
+DISH_EXPORT_FIELDS = ('name', 'description', 'recipe', 'diet_type', 'category', 'cooking_time', 'difficulty', 'portions')
+
+
+def export_dishes(queryset) -> list[dict]:
+    dishes = {dish['pk']: dish for dish in queryset.values('pk', *DISH_EXPORT_FIELDS)}
+    for dish in dishes.values():
+        dish['ingredients'] = []
+
+    dish_ingredients = (
+        DishIngredient.objects
+        .filter(dish__in=list(dishes))
+        .values('dish_id', 'quantity', 'ingredient__name', 'ingredient__unit', 'ingredient__diet_tags_mask', *(
+            f'ingredient__{field}' for field in NUTRIENT_FIELDS
+        ))
+    )
+    for dish_ingredient in dish_ingredients:
+        dishes[dish_ingredient['dish_id']]['ingredients'].append({
+            'name': dish_ingredient['ingredient__name'],
+            'unit': dish_ingredient['ingredient__unit'],
+            **{field: dish_ingredient[f'ingredient__{field}'] for field in NUTRIENT_FIELDS},
+            'diet_tags': mask_to_diet_tags(dish_ingredient['ingredient__diet_tags_mask']),
+            'quantity': dish_ingredient['quantity'],
+        })
+
+    for dish in dishes.values():
+        del dish['pk']
+    return list(dishes.values())
+
+
+def _describe(error: ValidationError) -> str:
+    return '; '.join(f'{field}: {" ".join(messages)}' for field, messages in error.message_dict.items())
+
+
+def _parse_dish(data: dict) -> tuple[Dish, list[tuple[dict, Decimal]]]:
+    dish = Dish(**{field: data[field] for field in DISH_EXPORT_FIELDS if field in data})
+    if not dish.name:
+        raise ValidationError('У блюда не указано название')
+    # Тип меню, категория, сложность, время приготовления и число порций проверяются по полям модели;
+    # описание может быть пустым в файлах, выгруженных из админки
+    try:
+        dish.full_clean(exclude=['description', 'recipe', 'photo'], validate_unique=False)
+    except ValidationError as error:
+        raise ValidationError(f'Блюдо «{dish.name}»: {_describe(error)}')
+    ingredients = []
+    seen = set()
+    for ingredient in data.get('ingredients', []):
+        key = (ingredient['name'], ingredient['unit'])
+        if key in seen:
+            raise ValidationError(f'Блюдо «{dish.name}»: ингредиент «{ingredient["name"]}» указан несколько раз')
+        seen.add(key)
+        ingredients.append((ingredient, Decimal(str(ingredient['quantity']))))
+    return dish, ingredients
+
+
+@transaction.atomic
+def import_dishes(data: list[dict]) -> int:
+    try:
+        parsed = [_parse_dish(dish_data) for dish_data in data]
+        # Ингредиенты сопоставляются по названию и единице измерения: количество «Молока» в мл
+        # нельзя отнести к ингредиенту с тем же названием в штуках
+        ingredients_data = {
+            (ingredient['name'], ingredient['unit']): ingredient
+            for _, ingredients in parsed
+            for ingredient, _ in ingredients
+        }
+        ingredients = {}
+        for ingredient in Ingredient.objects.filter(name__in={name for name, _ in ingredients_data}).order_by('pk'):
+            ingredients.setdefault((ingredient.name, ingredient.unit), ingredient)
+        new_ingredients = []
+        for (name, unit), ingredient_data in ingredients_data.items():
+            if (name, unit) in ingredients:
+                continue
+            unknown_tags = set(ingredient_data.get('diet_tags', [])) - set(DietTagChoices.values)
+            if unknown_tags:
+                raise ValidationError(f'Неизвестные пищевые метки ингредиента {name}: {", ".join(unknown_tags)}')
+            ingredient = Ingredient(
+                name=name,
+                unit=unit,
+                calories=Decimal(str(ingredient_data['calories'])),
+                # Файлы, выгруженные до появления БЖУ, содержат только калорийность
+                **{
+                    field: Decimal(str(ingredient_data[field]))
+                    for field in NUTRIENT_FIELDS
+                    if field != 'calories' and field in ingredient_data
+                },
+                diet_tags_mask=diet_tags_to_mask(ingredient_data.get('diet_tags', [])),
+            )
+            try:
+                ingredient.full_clean(validate_unique=False)
+            except ValidationError as error:
+                raise ValidationError(f'Ингредиент «{name}»: {_describe(error)}')
+            new_ingredients.append(ingredient)
+    except (KeyError, TypeError, InvalidOperation) as error:
+        raise ValidationError(f'Неверный формат файла: {error}')
+    # bulk_create не вызывает save(), поэтому нормализованные значения заполняются явно
+    for ingredient in new_ingredients:
+        ingredient.normalize()
+    ingredients.update(
+        ((ingredient.name, ingredient.unit), ingredient)
+        for ingredient in Ingredient.objects.bulk_create(new_ingredients)
+    )
+
+    dishes = Dish.objects.bulk_create(dish for dish, _ in parsed)
+    new_dish_ingredients = [
+        DishIngredient(dish=dish, ingredient=ingredients[ingredient['name'], ingredient['unit']], quantity=quantity)
+        for dish, (_, dish_ingredients) in zip(dishes, parsed)
+        for ingredient, quantity in dish_ingredients
+    ]
+    for dish_ingredient in new_dish_ingredients:
+        dish_ingredient.normalize()
+    DishIngredient.objects.bulk_create(new_dish_ingredients)
+    dish_ids = [dish.pk for dish in dishes]
+    Dish.objects.filter(pk__in=dish_ids).recalculate_nutrition()
+    # bulk_create не отправляет сигналы, поэтому поисковый индекс обновляется явно
+    index_dishes(dish_ids)
+    return len(dishes)
@@ -1,10 +1,21 @@
 from django import forms
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db.models import BLANK_CHOICE_DASH
 from django.utils.safestring import mark_safe
 
-from planner.models import Allergy, DietTypeChoices, MealTypeChoices, SubscriptionPlan
+from planner.models import (
+    Allergy,
+    DietTagChoices,
+    DietTypeChoices,
+    Dish,
+    Ingredient,
+    MealTypeChoices,
+    SubscriptionPlan,
+    UserSubscription,
+)
 
 
 class SubscriptionForm(forms.Form):
@@ -136,3 +147,162 @@ class UserProfileForm(forms.Form):
             self.user.save()
 
         return self.user
+
+
+class UserSubscriptionAdminForm(forms.ModelForm):
+    selected_meal_types = forms.MultipleChoiceField(
+        label='Выбранные приёмы пищи',
+        choices=MealTypeChoices.choices,
+        widget=forms.CheckboxSelectMultiple,
+    )
+
+    class Meta:
+        model = UserSubscription
+        exclude = ('meal_types_mask',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['selected_meal_types'].initial = self.instance.selected_meal_types
+
+    def save(self, commit=True):
+        self.instance.selected_meal_types = self.cleaned_data['selected_meal_types']
+        return super().save(commit=commit)
+
+
+class IngredientAdminForm(forms.ModelForm):
+    diet_tags = forms.MultipleChoiceField(
+        label='Пищевые метки',
+        choices=DietTagChoices.choices,
+        widget=forms.CheckboxSelectMultiple,
+        required=False,
+    )
+
+    class Meta:
+        model = Ingredient
+        exclude = ('diet_tags_mask',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['diet_tags'].initial = self.instance.diet_tags
+
+    def save(self, commit=True):
+        self.instance.diet_tags = self.cleaned_data['diet_tags']
+        return super().save(commit=commit)
+
+
+class DishActionForm(ActionForm):
+    diet_type = forms.ChoiceField(
+        label='Тип меню',
+        choices=BLANK_CHOICE_DASH + DietTypeChoices.choices,
+        required=False,
+    )
+    category = forms.ChoiceField(
+        label='Категория',
+        choices=BLANK_CHOICE_DASH + MealTypeChoices.choices,
+        required=False,
+    )
+    factor = forms.DecimalField(
+        label='Коэффициент',
+        min_value=0.01,
+        max_digits=6,
+        decimal_places=2,
+        required=False,
+    )
+
+
+class DishImportForm(forms.Form):
+    file = forms.FileField(
+        label='Файл JSON',
+    )
+
+
+class DishCatalogFilterForm(forms.Form):
+    category = forms.ChoiceField(
+        label='Приём пищи',
+        choices=BLANK_CHOICE_DASH,
+        widget=forms.Select(attrs={
+            'class': 'form-select',
+        }),
+        required=False,
+    )
+    difficulty = forms.ChoiceField(
+        label='Сложность',
+        choices=BLANK_CHOICE_DASH + Dish.DIFFICULTY_CHOICES,
+        widget=forms.Select(attrs={
+            'class': 'form-select',
+        }),
+        required=False,
+    )
+    cooking_time_min = forms.IntegerField(
+        label='Время приготовления от, мин',
+        min_value=0,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+        }),
+        required=False,
+    )
+    cooking_time_max = forms.IntegerField(
+        label='Время приготовления до, мин',
+        min_value=0,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+        }),
+        required=False,
+    )
+    calories_min = forms.DecimalField(
+        label='Калорийность от',
+        min_value=0,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+        }),
+        required=False,
+    )
+    calories_max = forms.DecimalField(
+        label='Калорийность до',
+        min_value=0,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+        }),
+        required=False,
+    )
+    exclude_tags = forms.MultipleChoiceField(
+        label='Без',
+        choices=DietTagChoices.choices,
+        widget=forms.CheckboxSelectMultiple(attrs={
+            'class': 'form-check-input',
+        }),
+        required=False,
+    )
+    after = forms.IntegerField(
+        min_value=0,
+        required=False,
+        widget=forms.HiddenInput,
+    )
+
+    RANGE_LOOKUPS = {
+        'cooking_time_min': 'cooking_time__gte',
+        'cooking_time_max': 'cooking_time__lte',
+        'calories_min': 'calories__gte',
+        'calories_max': 'calories__lte',
+    }
+
+    def __init__(self, *args, subscription=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Тип меню и приёмы пищи каталога задаёт подписка, выбрать можно только её приёмы пищи
+        selected_meal_types = subscription.selected_meal_types if subscription else []
+        self.fields['category'].choices = BLANK_CHOICE_DASH + [
+            (meal_type, label) for meal_type, label in MealTypeChoices.choices if meal_type in selected_meal_types
+        ]
+
+    def filter_queryset(self, queryset):
+        data = self.cleaned_data
+        for field in ('category', 'difficulty'):
+            if data[field]:
+                queryset = queryset.filter(**{field: data[field]})
+        for field, lookup in self.RANGE_LOOKUPS.items():
+            if data[field] is not None:
+                queryset = queryset.filter(**{lookup: data[field]})
+        queryset = queryset.without_diet_tags(data['exclude_tags'])
+        if data['after'] is not None:
+            queryset = queryset.filter(pk__gt=data['after'])
+        return queryset
@@ -0,0 +1,56 @@
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.models import DishIngredient
+from planner.nutrition import NutritionMatrix
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает расчёт калорийности блюд циклом по строкам и векторизованным движком'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз повторить каждый расчёт',
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        if repeat < 1:
+            raise CommandError('--repeat должен быть положительным.')
+
+        started = time.perf_counter()
+        rows = list(DishIngredient.objects.values_list('dish_id', 'base_quantity', 'ingredient__calories_per_base_unit'))
+        load_rows = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            loop_totals = defaultdict(Decimal)
+            for dish_id, base_quantity, calories_per_base_unit in rows:
+                loop_totals[dish_id] += calories_per_base_unit * base_quantity
+        loop_time = (time.perf_counter() - started) / repeat
+
+        started = time.perf_counter()
+        matrix = NutritionMatrix.load()
+        load_matrix = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            totals = matrix.dish_totals()
+        vector_time = (time.perf_counter() - started) / repeat
+
+        max_difference = max(
+            (abs(float(loop_totals[dish_id]) - total) for dish_id, total in zip(matrix.dish_ids.tolist(), totals[:, 0])),
+            default=0.0,
+        )
+
+        self.stdout.write(f'Блюд: {len(matrix.dish_ids)}, строк состава: {len(rows)}')
+        self.stdout.write(f'Загрузка строк: {load_rows * 1000:.1f} мс, загрузка матрицы: {load_matrix * 1000:.1f} мс')
+        self.stdout.write(f'Цикл по строкам: {loop_time * 1000:.2f} мс')
+        self.stdout.write(f'Векторизованный расчёт: {vector_time * 1000:.2f} мс')
+        self.stdout.write(f'Максимальное расхождение: {max_difference:.6f} ккал')
@@ -0,0 +1,121 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage import default_storage
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template import Engine, RequestContext, TemplateDoesNotExist, engines
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from planner.models import Dish
+from planner.views import DishCatalogView, DishDetailView, OrderView, ProfileView
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время рендеринга шаблонов основных страниц с кэширующим загрузчиком и без него, '
+        'а для страниц с шаблоном Jinja2 - и время рендеринга Jinja2'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            help='Пользователь с подпиской, от имени которого строятся страницы',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=100,
+            help='Сколько раз отрендерить каждый шаблон',
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        if repeat < 1:
+            raise CommandError('--repeat должен быть положительным.')
+        user = self.get_user(options['username'])
+
+        django_engine = engines['django']
+        uncached_engine = Engine(
+            dirs=django_engine.engine.dirs,
+            loaders=settings.TEMPLATE_LOADERS,
+            context_processors=django_engine.engine.context_processors,
+            libraries=django_engine.engine.libraries,
+        )
+
+        jinja2_engine = engines['jinja2']
+
+        self.stdout.write(
+            f'{"Шаблон":<20} {"кэш, мс":>10} {"без кэша, мс":>14} {"jinja2, мс":>12} {"запросов":>10}'
+        )
+        for template_name, request, context in self.get_pages(user):
+            template = django_engine.get_template(template_name)
+            template.render(context, request)
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    django_engine.get_template(template_name).render(context, request)
+                cached_time = (time.perf_counter() - started) / repeat
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                uncached_engine.get_template(template_name).render(RequestContext(request, context))
+            uncached_time = (time.perf_counter() - started) / repeat
+
+            jinja2_time = self.time_jinja2(jinja2_engine, template_name, context, request, repeat)
+
+            self.stdout.write(
+                f'{template_name:<20} {cached_time * 1000:>10.2f} {uncached_time * 1000:>14.2f} '
+                f'{jinja2_time:>12} {len(queries) / repeat:>10.1f}'
+            )
+
+    def time_jinja2(self, engine, template_name, context, request, repeat):
+        try:
+            template = engine.get_template(template_name)
+        except TemplateDoesNotExist:
+            return '-'
+        template.render(context, request)
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            engine.get_template(template_name).render(context, request)
+        return f'{(time.perf_counter() - started) / repeat * 1000:.2f}'
+
+    def get_user(self, username):
+        users = User.objects.filter(subscription__isnull=False)
+        user = users.filter(username=username).first() if username else users.first()
+        if user is None:
+            raise CommandError('Нужен пользователь с подпиской')
+        return user
+
+    def make_request(self, path, user):
+        request = RequestFactory().get(path)
+        request.user = user
+        request.session = SessionBase()
+        request._messages = default_storage(request)
+        return request
+
+    def get_pages(self, user):
+        yield 'index.html', self.make_request('/', user), {}
+
+        # Контекст берётся из самих представлений, рендеринг замеряется отдельно
+        pages = [
+            ('order', OrderView, {}),
+            ('profile', ProfileView, {}),
+            ('dish_catalog', DishCatalogView, {}),
+        ]
+        dish = Dish.objects.get_dishes_for_subscription(user.subscription).only('pk').first()
+        if dish:
+            pages.append(('dish_detail', DishDetailView, {'pk': dish.pk}))
+
+        for url_name, view_class, kwargs in pages:
+            request = self.make_request(reverse(url_name, kwargs=kwargs), user)
+            response = view_class.as_view()(request, **kwargs)
+            yield response.template_name[0], request, response.context_data
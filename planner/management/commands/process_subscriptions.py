@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from planner.models import SUBSCRIPTION_RENEWAL_DAYS, UserSubscription
+
+RENEWAL_REMINDER_SUBJECT = 'Ваша подписка FoodPlan скоро закончится'
+RENEWAL_REMINDER_TEXT = (
+    'Здравствуйте, {username}!\n\n'
+    'Подписка FoodPlan действует до {end_date:%d.%m.%Y}. '
+    'Продлите её, чтобы продолжать получать меню на каждый день.'
+)
+EXPIRY_NOTICE_SUBJECT = 'Ваша подписка FoodPlan закончилась'
+EXPIRY_NOTICE_TEXT = (
+    'Здравствуйте, {username}!\n\n'
+    'Подписка FoodPlan закончилась {end_date:%d.%m.%Y}. '
+    'Оформите новую подписку, чтобы снова получать меню на каждый день.'
+)
+
+
+class Command(BaseCommand):
+    help = 'Рассылает напоминания о продлении и уведомления об окончании подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--remind-days',
+            type=int,
+            default=SUBSCRIPTION_RENEWAL_DAYS,
+            help='За сколько дней до окончания подписки напоминать о продлении',
+        )
+        parser.add_argument(
+            '--expired-days',
+            type=int,
+            default=7,
+            help='Сколько дней после окончания подписки ещё отправлять уведомление о нём',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Количество подписок, обрабатываемых за раз',
+        )
+
+    def handle(self, *args, **options):
+        reminded = self.notify_in_chunks(
+            UserSubscription.objects.expiring_within(options['remind_days']).filter(
+                renewal_reminder_sent_at__isnull=True,
+            ),
+            'renewal_reminder_sent_at',
+            RENEWAL_REMINDER_SUBJECT,
+            RENEWAL_REMINDER_TEXT,
+            options['chunk_size'],
+        )
+        expired = self.notify_in_chunks(
+            # Приостановленные подписки не закончились, а подписки, закончившиеся давно, уже не актуальны
+            UserSubscription.objects.expired_within(options['expired_days']).filter(expiry_notice_sent_at__isnull=True),
+            'expiry_notice_sent_at',
+            EXPIRY_NOTICE_SUBJECT,
+            EXPIRY_NOTICE_TEXT,
+            options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Напоминаний о продлении: {reminded}, уведомлений об окончании: {expired}',
+        ))
+
+    def notify_in_chunks(self, queryset, sent_field, subject, text, chunk_size):
+        today = timezone.now().date()
+        queryset = queryset.order_by('pk').values_list('pk', 'end_date', 'user__username', 'user__email')
+        notified = 0
+        last_pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            send_mass_mail(
+                tuple(
+                    (
+                        subject,
+                        text.format(username=username, end_date=end_date),
+                        settings.DEFAULT_FROM_EMAIL,
+                        [email],
+                    )
+                    for _, end_date, username, email in chunk
+                ),
+            )
+            UserSubscription.objects.filter(pk__in=[pk for pk, *_ in chunk]).update(**{sent_field: today})
+            notified += len(chunk)
+        return notified
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0006_dailymenu_dailymeal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersubscription',
+            name='is_suspended',
+            field=models.BooleanField(default=False, help_text='Подписка приостановлена из-за неуспешной оплаты', verbose_name='Приостановлена'),
+        ),
+    ]
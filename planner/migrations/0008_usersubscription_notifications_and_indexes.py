@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0007_usersubscription_is_suspended'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersubscription',
+            name='expiry_notice_sent_at',
+            field=models.DateField(blank=True, null=True, verbose_name='Уведомление об окончании отправлено'),
+        ),
+        migrations.AddField(
+            model_name='usersubscription',
+            name='renewal_reminder_sent_at',
+            field=models.DateField(blank=True, null=True, verbose_name='Напоминание о продлении отправлено'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['is_suspended', 'end_date'], name='planner_use_is_susp_60b221_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['end_date'], name='planner_use_end_dat_b21910_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations, models
+
+# Биты приёмов пищи на момент миграции, в порядке MealTypeChoices
+MEAL_TYPE_BITS = {
+    'breakfast': 1,
+    'lunch': 2,
+    'dinner': 4,
+    'dessert': 8,
+}
+
+
+def meal_types_to_mask(meal_types) -> int:
+    mask = 0
+    for meal_type in meal_types:
+        mask |= MEAL_TYPE_BITS[meal_type]
+    return mask
+
+
+def mask_to_meal_types(mask: int) -> list[str]:
+    return [meal_type for meal_type, bit in MEAL_TYPE_BITS.items() if mask & bit]
+
+
+def fill_meal_types_mask(apps, schema_editor):
+    UserSubscription = apps.get_model('planner', 'UserSubscription')
+    subscriptions = list(UserSubscription.objects.only('pk', 'selected_meal_types'))
+    for subscription in subscriptions:
+        subscription.meal_types_mask = meal_types_to_mask(subscription.selected_meal_types or [])
+    UserSubscription.objects.bulk_update(subscriptions, ['meal_types_mask'], batch_size=1000)
+
+
+def fill_selected_meal_types(apps, schema_editor):
+    UserSubscription = apps.get_model('planner', 'UserSubscription')
+    subscriptions = list(UserSubscription.objects.only('pk', 'meal_types_mask'))
+    for subscription in subscriptions:
+        subscription.selected_meal_types = mask_to_meal_types(subscription.meal_types_mask)
+    UserSubscription.objects.bulk_update(subscriptions, ['selected_meal_types'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0008_usersubscription_notifications_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersubscription',
+            name='meal_types_mask',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, verbose_name='Выбранные приёмы пищи'),
+        ),
+        migrations.RunPython(fill_meal_types_mask, fill_selected_meal_types),
+        migrations.RemoveField(
+            model_name='usersubscription',
+            name='selected_meal_types',
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Поиск в админке (icontains/istartswith) на PostgreSQL строится как UPPER(col::text) LIKE ...,
+# GIN-индекс pg_trgm по тому же выражению позволяет выполнять его без полного просмотра таблицы
+TRIGRAM_INDEXES = [
+    ('planner_dish_name_trgm', 'planner_dish', 'name'),
+    ('planner_ingredient_name_trgm', 'planner_ingredient', 'name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)',
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0009_usersubscription_meal_types_mask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailymenu',
+            index=models.Index(fields=['date'], name='planner_dai_date_b83176_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:23
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_dish_calories(apps, schema_editor):
+    Dish = apps.get_model('planner', 'Dish')
+    DishIngredient = apps.get_model('planner', 'DishIngredient')
+    dish_calories = (
+        DishIngredient.objects
+        .filter(dish=OuterRef('pk'))
+        .values('dish')
+        .annotate(total=Sum(F('ingredient__calories') * F('quantity')))
+        .values('total')
+    )
+    Dish.objects.update(
+        calories=Coalesce(
+            Subquery(dish_calories, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0010_dailymenu_date_index_and_trigram_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='calories',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Пересчитывается при изменении ингредиентов', max_digits=12, verbose_name='Калорийность блюда'),
+        ),
+        migrations.RunPython(fill_dish_calories, migrations.RunPython.noop),
+    ]
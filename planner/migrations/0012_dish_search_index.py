@@ -0,0 +1,70 @@
+from django.db import migrations
+
+SQLITE_TABLE = 'planner_dish_fts'
+POSTGRES_TABLE = 'planner_dish_search'
+
+# Токенизатор FTS5 на момент миграции: регистронезависимый Unicode без учёта диакритики
+SQLITE_TOKENIZER = 'unicode61 remove_diacritics 2'
+
+
+def _ingredient_names_sql(apps, aggregate):
+    dish_ingredient_table = apps.get_model('planner', 'DishIngredient')._meta.db_table
+    ingredient_table = apps.get_model('planner', 'Ingredient')._meta.db_table
+    return (
+        f'SELECT {aggregate} FROM {dish_ingredient_table} di '
+        f'JOIN {ingredient_table} i ON i.id = di.ingredient_id WHERE di.dish_id = d.id'
+    )
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    dish_table = apps.get_model('planner', 'Dish')._meta.db_table
+    if vendor == 'sqlite':
+        ingredients = _ingredient_names_sql(apps, "group_concat(i.name, ' ')")
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5('
+            f"name, description, recipe, ingredients, tokenize = '{SQLITE_TOKENIZER}')",
+        )
+        schema_editor.execute(
+            f'INSERT INTO {SQLITE_TABLE} (rowid, name, description, recipe, ingredients) '
+            f"SELECT d.id, d.name, d.description, d.recipe, COALESCE(({ingredients}), '') "
+            f'FROM {dish_table} d',
+        )
+    elif vendor == 'postgresql':
+        ingredients = _ingredient_names_sql(apps, "string_agg(i.name, ' ')")
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ('
+            f'dish_id bigint PRIMARY KEY REFERENCES {dish_table} (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)',
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document ON {POSTGRES_TABLE} USING gin (document)',
+        )
+        schema_editor.execute(
+            f'INSERT INTO {POSTGRES_TABLE} (dish_id, document) '
+            'SELECT d.id, '
+            "setweight(to_tsvector('russian', d.name), 'A') || "
+            f"setweight(to_tsvector('russian', COALESCE(({ingredients}), '')), 'B') || "
+            "setweight(to_tsvector('russian', d.description), 'B') || "
+            "setweight(to_tsvector('russian', d.recipe), 'C') "
+            f'FROM {dish_table} d',
+        )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {POSTGRES_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0011_dish_calories'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,169 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+# Белки, жиры и углеводы ингредиентов из начальных данных, в граммах на ту же базу, что и калорийность
+# (на 100 г / 100 мл или на 1 шт.)
+INGREDIENT_MACROS = {
+    'Куриная грудка': (31, 3.6, 0),
+    'Говядина': (26, 17, 0),
+    'Индейка': (29, 7.4, 0),
+    'Лосось': (20, 13, 0),
+    'Тунец консервированный': (29, 6.4, 0),
+    'Яйца куриные': (12.6, 10.6, 1.1),
+    'Тофу': (8, 4.8, 1.9),
+    'Творог 5%': (17, 5, 1.8),
+    'Греческий йогурт': (10, 0.4, 3.6),
+    'Сыр фета': (14, 21, 4.1),
+    'Сыр моцарелла': (28, 17, 3.1),
+    'Креветки': (20, 0.5, 0),
+    'Брокколи': (2.8, 0.4, 6.6),
+    'Шпинат': (2.9, 0.4, 3.6),
+    'Помидоры': (0.9, 0.2, 3.9),
+    'Огурцы': (0.7, 0.1, 3.6),
+    'Морковь': (0.9, 0.2, 9.6),
+    'Лук репчатый': (1.1, 0.1, 9.3),
+    'Чеснок': (6.4, 0.5, 33),
+    'Авокадо': (2, 15, 8.5),
+    'Сладкий перец': (1, 0.3, 6),
+    'Цукини': (1.2, 0.3, 3.1),
+    'Баклажаны': (1, 0.2, 5.9),
+    'Картофель': (2, 0.1, 17),
+    'Цветная капуста': (1.9, 0.3, 5),
+    'Спаржа': (2.2, 0.1, 3.9),
+    'Зеленый горошек': (5.4, 0.4, 14),
+    'Овсяные хлопья': (2.4, 1.4, 12),
+    'Гречка': (4.2, 1.1, 21),
+    'Киноа': (4.4, 1.9, 21),
+    'Бурый рис': (2.6, 0.9, 23),
+    'Чечевица': (9, 0.4, 20),
+    'Нут': (19, 6, 61),
+    'Булгур': (3.1, 0.2, 19),
+    'Перловая крупа': (2.3, 0.4, 28),
+    'Молоко 2.5%': (2.8, 2.5, 4.7),
+    'Сливки 10%': (3, 10, 4),
+    'Сметана 15%': (2.6, 15, 3),
+    'Сыр пармезан': (38, 29, 4.1),
+    'Миндаль': (21, 50, 22),
+    'Грецкие орехи': (15, 65, 14),
+    'Семена чиа': (17, 31, 42),
+    'Льняное семя': (18, 42, 29),
+    'Семена подсолнечника': (21, 51, 20),
+    'Кедровые орехи': (14, 68, 13),
+    'Бананы': (1.1, 0.3, 23),
+    'Яблоки': (0.3, 0.2, 14),
+    'Груши': (0.4, 0.1, 15),
+    'Клубника': (0.7, 0.3, 7.7),
+    'Черника': (0.7, 0.3, 14),
+    'Малина': (1.2, 0.7, 12),
+    'Апельсины': (0.9, 0.1, 12),
+    'Лимон': (1.1, 0.3, 9.3),
+    'Лайм': (0.7, 0.2, 11),
+    'Виноград': (0.7, 0.2, 18),
+    'Оливковое масло': (0, 100, 0),
+    'Кокосовое масло': (0, 99, 0),
+    'Яблочный уксус': (0, 0, 0.9),
+    'Соевый соус': (8.1, 0.6, 4.9),
+    'Бальзамический уксус': (0.5, 0, 17),
+    'Базилик свежий': (3.2, 0.6, 2.7),
+    'Петрушка': (3, 0.8, 6.3),
+    'Укроп': (3.5, 1.1, 7),
+    'Кинза': (2.1, 0.5, 3.7),
+    'Мята': (3.8, 0.9, 8),
+    'Орегано сушеный': (9, 4.3, 69),
+    'Паприка молотая': (14, 13, 54),
+    'Куркума молотая': (8, 10, 65),
+    'Корица молотая': (4, 1.2, 81),
+    'Имбирь свежий': (1.8, 0.8, 18),
+    'Мед': (0.3, 0, 82),
+    'Кленовый сироп': (0, 0.1, 67),
+    'Темный шоколад 70%': (7.8, 43, 46),
+    'Кокосовое молоко': (2.3, 24, 6),
+    'Томатная паста': (4.3, 0.5, 19),
+    'Горчица дижонская': (4.4, 4, 5.8),
+}
+
+NUTRIENT_FIELDS = ('calories', 'protein', 'fat', 'carbs')
+PER_HUNDRED_UNITS = ('g', 'ml')
+
+
+def fill_macros(apps, schema_editor):
+    Ingredient = apps.get_model('planner', 'Ingredient')
+    Dish = apps.get_model('planner', 'Dish')
+    DishIngredient = apps.get_model('planner', 'DishIngredient')
+
+    ingredients = list(Ingredient.objects.filter(name__in=INGREDIENT_MACROS))
+    for ingredient in ingredients:
+        ingredient.protein, ingredient.fat, ingredient.carbs = (
+            Decimal(str(value)) for value in INGREDIENT_MACROS[ingredient.name]
+        )
+    Ingredient.objects.bulk_update(ingredients, ['protein', 'fat', 'carbs'])
+
+    factor = Case(
+        When(ingredient__unit__in=PER_HUNDRED_UNITS, then=Value(Decimal('0.01'))),
+        default=Value(Decimal('1')),
+        output_field=models.DecimalField(),
+    )
+    totals = {}
+    for field in NUTRIENT_FIELDS:
+        dish_total = (
+            DishIngredient.objects
+            .filter(dish=OuterRef('pk'))
+            .values('dish')
+            .annotate(total=Sum(F(f'ingredient__{field}') * F('quantity') * factor))
+            .values('total')
+        )
+        totals[field] = Coalesce(
+            Subquery(dish_total, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+    Dish.objects.update(**totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0012_dish_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='calories',
+            field=models.DecimalField(decimal_places=2, help_text='На 100 г / 100 мл или на 1 шт. / ложку в зависимости от единицы измерения', max_digits=7, verbose_name='Калорийность'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='protein',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='На 100 г / 100 мл или на 1 шт. / ложку в зависимости от единицы измерения', max_digits=7, verbose_name='Белки, г'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='fat',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='На 100 г / 100 мл или на 1 шт. / ложку в зависимости от единицы измерения', max_digits=7, verbose_name='Жиры, г'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='carbs',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='На 100 г / 100 мл или на 1 шт. / ложку в зависимости от единицы измерения', max_digits=7, verbose_name='Углеводы, г'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='protein',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Пересчитывается при изменении ингредиентов', max_digits=10, verbose_name='Белки, г'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='fat',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Пересчитывается при изменении ингредиентов', max_digits=10, verbose_name='Жиры, г'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='carbs',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Пересчитывается при изменении ингредиентов', max_digits=10, verbose_name='Углеводы, г'),
+        ),
+        migrations.RunPython(fill_macros, migrations.RunPython.noop),
+    ]
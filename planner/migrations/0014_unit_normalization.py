@@ -0,0 +1,84 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:43
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+NUTRIENT_FIELDS = ('calories', 'protein', 'fat', 'carbs')
+# Единица ингредиента: (база пищевой ценности, базовых единиц в одной единице)
+UNITS = {
+    'g': (100, 1),
+    'ml': (100, 1),
+    'pcs': (1, 1),
+    'tbsp': (1, 15),
+    'tsp': (1, 5),
+}
+
+
+def normalize_units(apps, schema_editor):
+    Ingredient = apps.get_model('planner', 'Ingredient')
+    DishIngredient = apps.get_model('planner', 'DishIngredient')
+    Dish = apps.get_model('planner', 'Dish')
+
+    for unit, (basis, base_unit_factor) in UNITS.items():
+        factor = Decimal(1) / (basis * base_unit_factor)
+        Ingredient.objects.filter(unit=unit).update(**{
+            f'{field}_per_base_unit': F(field) * Value(factor) for field in NUTRIENT_FIELDS
+        })
+        DishIngredient.objects.filter(ingredient__unit=unit).update(
+            base_quantity=F('quantity') * Value(Decimal(base_unit_factor)),
+        )
+
+    totals = {}
+    for field in NUTRIENT_FIELDS:
+        dish_total = (
+            DishIngredient.objects
+            .filter(dish=OuterRef('pk'))
+            .values('dish')
+            .annotate(total=Sum(F(f'ingredient__{field}_per_base_unit') * F('base_quantity')))
+            .values('total')
+        )
+        totals[field] = Coalesce(
+            Subquery(dish_total, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+    Dish.objects.update(**totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0013_ingredient_dish_macros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dishingredient',
+            name='base_quantity',
+            field=models.DecimalField(decimal_places=4, default=0, editable=False, help_text='Граммы, миллилитры или штуки; пересчитывается при сохранении', max_digits=14, verbose_name='Количество в базовых единицах'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='calories_per_base_unit',
+            field=models.DecimalField(decimal_places=6, default=0, editable=False, max_digits=14, verbose_name='Калорийность на базовую единицу'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='carbs_per_base_unit',
+            field=models.DecimalField(decimal_places=6, default=0, editable=False, max_digits=14, verbose_name='Углеводы на базовую единицу, г'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='fat_per_base_unit',
+            field=models.DecimalField(decimal_places=6, default=0, editable=False, max_digits=14, verbose_name='Жиры на базовую единицу, г'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='protein_per_base_unit',
+            field=models.DecimalField(decimal_places=6, default=0, editable=False, max_digits=14, verbose_name='Белки на базовую единицу, г'),
+        ),
+        migrations.RunPython(normalize_units, migrations.RunPython.noop),
+    ]
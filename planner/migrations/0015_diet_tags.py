@@ -0,0 +1,81 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:46
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Value
+
+# Биты меток в порядке DietTagChoices
+DIET_TAG_BITS = {
+    'meat': 1,
+    'fish': 2,
+    'dairy': 4,
+    'gluten': 8,
+    'high_carb': 16,
+}
+
+# Метки ингредиентов из начальных данных; ингредиенты, которых нет в базе, пропускаются
+INGREDIENT_TAGS = {
+    'meat': [
+        'Баранина', 'Бекон', 'Говядина', 'Говяжий фарш', 'Говяжьи ребра', 'Индейка', 'Колбаса сырокопченая',
+        'Куриная грудка', 'Куриные бедра', 'Куриные крылышки', 'Свиная вырезка', 'Утиная грудка', 'Утиный жир',
+        'Желатин',
+    ],
+    'fish': ['Креветки', 'Лосось', 'Тунец консервированный'],
+    'dairy': [
+        'Греческий йогурт', 'Молоко 2.5%', 'Сливки 10%', 'Сливочное масло', 'Сметана 15%', 'Сыр маскарпоне',
+        'Сыр моцарелла', 'Сыр пармезан', 'Сыр сливочный', 'Сыр фета', 'Сыр чеддер', 'Творог 5%',
+    ],
+    'gluten': [
+        'Булгур', 'Лапша яичная', 'Листы для лазаньи', 'Манная крупа', 'Мука пшеничная', 'Овсяные хлопья',
+        'Перловая крупа', 'Печенье песочное', 'Печенье савоярди', 'Соевый соус', 'Хлеб цельнозерновой',
+    ],
+    'high_carb': [
+        'Бананы', 'Булгур', 'Бурый рис', 'Виноград', 'Гречка', 'Картофель', 'Киноа', 'Кленовый сироп',
+        'Лапша яичная', 'Листы для лазаньи', 'Манная крупа', 'Мед', 'Мука нутовая', 'Мука пшеничная', 'Нут',
+        'Овсяные хлопья', 'Перловая крупа', 'Печенье песочное', 'Печенье савоярди', 'Рис', 'Рис арборио',
+        'Сахар', 'Хлеб цельнозерновой', 'Чечевица',
+    ],
+}
+
+
+def fill_diet_tags(apps, schema_editor):
+    Ingredient = apps.get_model('planner', 'Ingredient')
+    Dish = apps.get_model('planner', 'Dish')
+    DishIngredient = apps.get_model('planner', 'DishIngredient')
+
+    ingredients = {ingredient.name: ingredient for ingredient in Ingredient.objects.all()}
+    for tag, names in INGREDIENT_TAGS.items():
+        for name in names:
+            if name in ingredients:
+                ingredients[name].diet_tags_mask |= DIET_TAG_BITS[tag]
+    Ingredient.objects.bulk_update(ingredients.values(), ['diet_tags_mask'])
+
+    diet_tags_mask = Value(0)
+    for bit in DIET_TAG_BITS.values():
+        masks = [mask for mask in range(1, 1 << len(DIET_TAG_BITS)) if mask & bit]
+        has_tag = DishIngredient.objects.filter(dish=OuterRef('pk'), ingredient__diet_tags_mask__in=masks)
+        diet_tags_mask = diet_tags_mask + models.Case(
+            models.When(Exists(has_tag), then=Value(bit)),
+            default=Value(0),
+        )
+    Dish.objects.update(diet_tags_mask=diet_tags_mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0014_unit_normalization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='diet_tags_mask',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False, help_text='Пересчитывается при изменении ингредиентов', verbose_name='Пищевые метки'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='diet_tags_mask',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Пищевые метки'),
+        ),
+        migrations.RunPython(fill_diet_tags, migrations.RunPython.noop),
+    ]
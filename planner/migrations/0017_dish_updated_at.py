@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0016_usersubscription_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Обновляется и при изменении ингредиентов блюда', verbose_name='Дата изменения'),
+        ),
+    ]
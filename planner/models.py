@@ -1,11 +1,17 @@
 import random
 import uuid
+from datetime import timedelta
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Count, Exists, F, Max, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+from monitoring.metrics import MENU_ELIGIBLE_DISHES, MENU_GENERATION_SECONDS, MENU_GENERATIONS
 
 
 class DietTypeChoices(models.TextChoices):
@@ -15,6 +21,17 @@ class DietTypeChoices(models.TextChoices):
     KETO = 'keto', 'Кето'
 
 
+NUTRIENT_FIELDS = ('calories', 'protein', 'fat', 'carbs')
+
+CARBS_KCAL_PER_GRAM = 4
+
+# Максимальная доля энергии из углеводов для блюд низкоуглеводного и кето-меню
+DIET_CARBS_ENERGY_LIMITS = {
+    DietTypeChoices.LOW_CARB: Decimal('0.26'),
+    DietTypeChoices.KETO: Decimal('0.10'),
+}
+
+
 class MealTypeChoices(models.TextChoices):
     BREAKFAST = 'breakfast', 'Завтраки'
     LUNCH = 'lunch', 'Обеды'
@@ -22,6 +39,68 @@ class MealTypeChoices(models.TextChoices):
     DESSERT = 'dessert', 'Десерты'
 
 
+# Приёмы пищи подписки хранятся битовой маской: одна маска на подписку вместо JSON-списка
+MEAL_TYPE_BITS = {meal_type.value: 1 << index for index, meal_type in enumerate(MealTypeChoices)}
+
+
+def meal_types_to_mask(meal_types) -> int:
+    mask = 0
+    for meal_type in meal_types:
+        mask |= MEAL_TYPE_BITS[str(meal_type)]
+    return mask
+
+
+def mask_to_meal_types(mask: int) -> list[str]:
+    return [meal_type for meal_type, bit in MEAL_TYPE_BITS.items() if mask & bit]
+
+
+def masks_with_meal_type(meal_type) -> list[int]:
+    # Возможных масок всего 2^4, поэтому фильтр по приёму пищи - это IN по индексу
+    bit = MEAL_TYPE_BITS[str(meal_type)]
+    return [mask for mask in range(1, 1 << len(MEAL_TYPE_BITS)) if mask & bit]
+
+
+class DietTagChoices(models.TextChoices):
+    MEAT = 'meat', 'Мясо и птица'
+    FISH = 'fish', 'Рыба и морепродукты'
+    DAIRY = 'dairy', 'Молочные продукты'
+    GLUTEN = 'gluten', 'Глютен'
+    HIGH_CARB = 'high_carb', 'Много углеводов'
+
+
+# Пищевые метки ингредиентов задаются вручную, метки блюда - объединение меток его ингредиентов
+DIET_TAG_BITS = {tag.value: 1 << index for index, tag in enumerate(DietTagChoices)}
+
+# Метки, с которыми блюдо не подходит для типа меню
+DIET_TYPE_EXCLUDED_TAGS = {
+    DietTypeChoices.VEGETARIAN: (DietTagChoices.MEAT, DietTagChoices.FISH),
+    DietTypeChoices.LOW_CARB: (DietTagChoices.HIGH_CARB,),
+    DietTypeChoices.KETO: (DietTagChoices.HIGH_CARB,),
+}
+
+
+def diet_tags_to_mask(tags) -> int:
+    mask = 0
+    for tag in tags:
+        mask |= DIET_TAG_BITS[str(tag)]
+    return mask
+
+
+def mask_to_diet_tags(mask: int) -> list[str]:
+    return [tag for tag, bit in DIET_TAG_BITS.items() if mask & bit]
+
+
+def masks_with_diet_tag(tag) -> list[int]:
+    bit = DIET_TAG_BITS[str(tag)]
+    return [mask for mask in range(1, 1 << len(DIET_TAG_BITS)) if mask & bit]
+
+
+def masks_without_diet_tags(tags) -> list[int]:
+    # Возможных масок всего 2^5, поэтому исключение меток - это IN по индексу
+    excluded = diet_tags_to_mask(tags)
+    return [mask for mask in range(1 << len(DIET_TAG_BITS)) if not mask & excluded]
+
+
 class Allergy(models.Model):
     name = models.CharField(
         'Аллергия',
@@ -103,6 +182,41 @@ class SubscriptionPlan(models.Model):
         return total
 
 
+# За сколько дней до окончания подписки напоминать о продлении и разрешать продлить её
+SUBSCRIPTION_RENEWAL_DAYS = 3
+
+
+class UserSubscriptionQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_suspended=False, end_date__gte=timezone.now().date())
+
+    def inactive(self):
+        return self.filter(models.Q(is_suspended=True) | models.Q(end_date__lt=timezone.now().date()))
+
+    def expiring_within(self, days: int):
+        return self.active().filter(end_date__lte=timezone.now().date() + timedelta(days=days))
+
+    def expired_within(self, days: int):
+        today = timezone.now().date()
+        return self.filter(is_suspended=False, end_date__lt=today, end_date__gte=today - timedelta(days=days))
+
+    def with_meal_type(self, meal_type):
+        return self.filter(meal_types_mask__in=masks_with_meal_type(meal_type))
+
+    def with_active_flag(self):
+        return self.annotate(
+            active_now=models.Case(
+                models.When(
+                    is_suspended=False,
+                    end_date__gte=timezone.now().date(),
+                    then=models.Value(True),
+                ),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+
 class UserSubscription(models.Model):
     user = models.OneToOneField(
         get_user_model(),
@@ -120,9 +234,10 @@ class UserSubscription(models.Model):
         blank=True,
         verbose_name='Аллергии',
     )
-    selected_meal_types = models.JSONField(
+    meal_types_mask = models.PositiveSmallIntegerField(
         'Выбранные приёмы пищи',
-        default=list,
+        default=0,
+        db_index=True,
     )
     persons_count = models.IntegerField(
         'Количество персон',
@@ -141,17 +256,50 @@ class UserSubscription(models.Model):
     end_date = models.DateField(
         'Дата окончания подписки',
     )
+    is_suspended = models.BooleanField(
+        'Приостановлена',
+        default=False,
+        help_text='Подписка приостановлена из-за неуспешной оплаты',
+    )
+    renewal_reminder_sent_at = models.DateField(
+        'Напоминание о продлении отправлено',
+        null=True,
+        blank=True,
+    )
+    expiry_notice_sent_at = models.DateField(
+        'Уведомление об окончании отправлено',
+        null=True,
+        blank=True,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+
+    objects = UserSubscriptionQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Подписка пользователя'
         verbose_name_plural = 'Подписки пользователей'
+        indexes = [
+            models.Index(fields=['is_suspended', 'end_date']),
+            models.Index(fields=['end_date']),
+        ]
 
     def __str__(self):
         return f"Подписка {self.user.username}"
 
     @property
     def is_active(self):
-        return self.end_date >= timezone.now().date()
+        return not self.is_suspended and self.end_date >= timezone.now().date()
+
+    @property
+    def selected_meal_types(self) -> list[str]:
+        return mask_to_meal_types(self.meal_types_mask)
+
+    @selected_meal_types.setter
+    def selected_meal_types(self, meal_types):
+        self.meal_types_mask = meal_types_to_mask(meal_types)
 
     @property
     def total_price(self):
@@ -208,6 +356,31 @@ class Ingredient(models.Model):
         ('tbsp', 'Столовые ложки'),
         ('tsp', 'Чайные ложки'),
     ]
+    UNIT_SHORT_NAMES = {
+        'g': 'г',
+        'ml': 'мл',
+        'pcs': 'шт.',
+        'tbsp': 'ст. л.',
+        'tsp': 'ч. л.',
+    }
+    # Пищевая ценность весовых и объёмных ингредиентов указывается на 100 г / 100 мл, остальных - на единицу
+    NUTRITION_BASIS = {
+        'g': 100,
+        'ml': 100,
+        'pcs': 1,
+        'tbsp': 1,
+        'tsp': 1,
+    }
+    NUTRITION_HELP_TEXT = 'На 100 г / 100 мл или на 1 шт. / ложку в зависимости от единицы измерения'
+    # Базовая единица и сколько базовых единиц в одной единице ингредиента
+    BASE_UNITS = {
+        'g': ('g', 1),
+        'ml': ('ml', 1),
+        'pcs': ('pcs', 1),
+        'tbsp': ('ml', 15),
+        'tsp': ('ml', 5),
+    }
+
     name = models.CharField(
         'Название ингредиента',
         max_length=150,
@@ -221,6 +394,28 @@ class Ingredient(models.Model):
         'Калорийность',
         max_digits=7,
         decimal_places=2,
+        help_text=NUTRITION_HELP_TEXT,
+    )
+    protein = models.DecimalField(
+        'Белки, г',
+        max_digits=7,
+        decimal_places=2,
+        default=0,
+        help_text=NUTRITION_HELP_TEXT,
+    )
+    fat = models.DecimalField(
+        'Жиры, г',
+        max_digits=7,
+        decimal_places=2,
+        default=0,
+        help_text=NUTRITION_HELP_TEXT,
+    )
+    carbs = models.DecimalField(
+        'Углеводы, г',
+        max_digits=7,
+        decimal_places=2,
+        default=0,
+        help_text=NUTRITION_HELP_TEXT,
     )
     unit = models.CharField(
         'Единица измерения',
@@ -228,6 +423,39 @@ class Ingredient(models.Model):
         choices=UNIT_CHOICES,
         default='g',
     )
+    diet_tags_mask = models.PositiveSmallIntegerField(
+        'Пищевые метки',
+        default=0,
+    )
+    # Пищевая ценность на одну базовую единицу (1 г, 1 мл или 1 шт.), пересчитывается при сохранении
+    calories_per_base_unit = models.DecimalField(
+        'Калорийность на базовую единицу',
+        max_digits=14,
+        decimal_places=6,
+        default=0,
+        editable=False,
+    )
+    protein_per_base_unit = models.DecimalField(
+        'Белки на базовую единицу, г',
+        max_digits=14,
+        decimal_places=6,
+        default=0,
+        editable=False,
+    )
+    fat_per_base_unit = models.DecimalField(
+        'Жиры на базовую единицу, г',
+        max_digits=14,
+        decimal_places=6,
+        default=0,
+        editable=False,
+    )
+    carbs_per_base_unit = models.DecimalField(
+        'Углеводы на базовую единицу, г',
+        max_digits=14,
+        decimal_places=6,
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -236,16 +464,102 @@ class Ingredient(models.Model):
     def __str__(self):
         return f'{self.name} ({self.get_unit_display()})'
 
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
+    @property
+    def nutrition_basis(self):
+        return self.NUTRITION_BASIS[self.unit]
+
+    def get_nutrition_basis_display(self):
+        return f'на {self.nutrition_basis} {self.UNIT_SHORT_NAMES[self.unit]}'
+
+    @property
+    def diet_tags(self) -> list[str]:
+        return mask_to_diet_tags(self.diet_tags_mask)
+
+    @diet_tags.setter
+    def diet_tags(self, tags):
+        self.diet_tags_mask = diet_tags_to_mask(tags)
+
+    @property
+    def base_unit_factor(self):
+        return self.BASE_UNITS[self.unit][1]
+
+    def normalize(self):
+        divisor = Decimal(self.nutrition_basis * self.base_unit_factor)
+        for field in NUTRIENT_FIELDS:
+            per_base_unit = Decimal(getattr(self, field)) / divisor
+            setattr(self, f'{field}_per_base_unit', per_base_unit.quantize(Decimal('0.000001')))
+
 
 def get_dish_upload_path(instance, filename: str) -> str:
     return f'dishes/{get_unique_filename(filename)}'
 
 
-class DishManager(models.Manager):
+# Длинные текстовые поля блюда нужны только на странице блюда и в форме редактирования
+DISH_TEXT_FIELDS = ('description', 'recipe')
+
+# Сколько ингредиентов блюда показывать в карточке меню
+MENU_INGREDIENTS_PREVIEW = 5
+
+
+class DishQuerySet(models.QuerySet):
+    def for_listing(self):
+        return self.only('name', 'category', 'diet_type', 'cooking_time', 'difficulty', 'calories', 'photo')
+
+    def not_fitting_diet_type(self):
+        conditions = Q()
+        for diet_type, limit in DIET_CARBS_ENERGY_LIMITS.items():
+            conditions |= Q(diet_type=diet_type, carbs_energy__gt=F('calories') * limit)
+        return self.alias(carbs_energy=F('carbs') * CARBS_KCAL_PER_GRAM).filter(conditions)
+
+    def without_diet_tags(self, tags):
+        if not tags:
+            return self
+        return self.filter(diet_tags_mask__in=masks_without_diet_tags(tags))
+
+    def compatible_with(self, diet_type):
+        return self.without_diet_tags(DIET_TYPE_EXCLUDED_TAGS.get(diet_type, ()))
+
+    def recalculate_nutrition(self) -> int:
+        # Побитового ИЛИ среди агрегатов нет во всех СУБД, поэтому маска собирается по одному биту
+        diet_tags_mask = Value(0)
+        for tag, bit in DIET_TAG_BITS.items():
+            has_tag = DishIngredient.objects.filter(
+                dish=OuterRef('pk'),
+                ingredient__diet_tags_mask__in=masks_with_diet_tag(tag),
+            )
+            diet_tags_mask = diet_tags_mask + models.Case(
+                models.When(Exists(has_tag), then=Value(bit)),
+                default=Value(0),
+            )
+
+        totals = {'diet_tags_mask': diet_tags_mask, 'updated_at': timezone.now()}
+        for field in NUTRIENT_FIELDS:
+            dish_total = (
+                DishIngredient.objects
+                .filter(dish=OuterRef('pk'))
+                .values('dish')
+                .annotate(total=Sum(F(f'ingredient__{field}_per_base_unit') * F('base_quantity')))
+                .values('total')
+            )
+            totals[field] = Coalesce(
+                Subquery(dish_total, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+        return self.update(**totals)
+
+
+class DishManager(models.Manager.from_queryset(DishQuerySet)):
     def get_dishes_for_subscription(self, subscription):
         return self.filter(
             diet_type=subscription.diet_type,
             category__in=subscription.selected_meal_types,
+        ).compatible_with(
+            subscription.diet_type,
         ).exclude(
             ingredients__allergens__in=subscription.allergies.all(),
         ).distinct()
@@ -309,6 +623,50 @@ class Dish(models.Model):
         default=1,
         help_text='На сколько персон рассчитано блюдо',
     )
+    calories = models.DecimalField(
+        'Калорийность блюда',
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text='Пересчитывается при изменении ингредиентов',
+    )
+    protein = models.DecimalField(
+        'Белки, г',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text='Пересчитывается при изменении ингредиентов',
+    )
+    fat = models.DecimalField(
+        'Жиры, г',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text='Пересчитывается при изменении ингредиентов',
+    )
+    carbs = models.DecimalField(
+        'Углеводы, г',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text='Пересчитывается при изменении ингредиентов',
+    )
+    diet_tags_mask = models.PositiveSmallIntegerField(
+        'Пищевые метки',
+        default=0,
+        editable=False,
+        db_index=True,
+        help_text='Пересчитывается при изменении ингредиентов',
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        help_text='Обновляется и при изменении ингредиентов блюда',
+    )
 
     objects = DishManager()
 
@@ -324,10 +682,7 @@ class Dish(models.Model):
 
     @property
     def total_calories(self):
-        total = Decimal('0')
-        for di in self.dishingredient_set.select_related('ingredient').all():
-            total += di.ingredient.calories * di.quantity
-        return total.quantize(Decimal('0.01'))
+        return self.calories
 
     @property
     def calories_per_portion(self):
@@ -335,22 +690,40 @@ class Dish(models.Model):
             return (self.total_calories / self.portions).quantize(Decimal('0.01'))
         return Decimal('0')
 
+    @property
+    def carbs_energy_share(self):
+        if self.calories > 0:
+            return (self.carbs * CARBS_KCAL_PER_GRAM / self.calories).quantize(Decimal('0.01'))
+        return Decimal('0')
+
+    @property
+    def fits_diet_type(self):
+        limit = DIET_CARBS_ENERGY_LIMITS.get(self.diet_type)
+        return limit is None or self.carbs_energy_share <= limit
+
+    @property
+    def diet_tags(self) -> list[str]:
+        return mask_to_diet_tags(self.diet_tags_mask)
+
+    def is_compatible_with(self, diet_type) -> bool:
+        return not self.diet_tags_mask & diet_tags_to_mask(DIET_TYPE_EXCLUDED_TAGS.get(diet_type, ()))
+
     @property
     def is_vegetarian(self):
-        non_veg_keywords = ['мясо', 'куриц', 'говядин', 'свинин', 'баранин', 'рыб', 'морепродукт']
-        return not any(keyword in self.name.lower() or
-                       any(keyword in ing.name.lower() for ing in self.ingredients.all())
-                       for keyword in non_veg_keywords)
+        return self.is_compatible_with(DietTypeChoices.VEGETARIAN)
 
     def get_ingredients_list(self):
+        from planner.nutrition import ingredient_nutrition
+
+        dish_ingredients = list(self.dishingredient_set.select_related('ingredient').all())
         return [
             {
                 'name': di.ingredient.name,
                 'quantity': di.quantity,
                 'unit': di.ingredient.get_unit_display(),
-                'calories': (di.ingredient.calories * di.quantity).quantize(Decimal('0.01')),
+                'calories': nutrition['calories'],
             }
-            for di in self.dishingredient_set.select_related('ingredient').all()
+            for di, nutrition in zip(dish_ingredients, ingredient_nutrition(dish_ingredients))
         ]
 
 
@@ -368,6 +741,14 @@ class DishIngredient(models.Model):
         max_digits=10,
         decimal_places=2,
     )
+    base_quantity = models.DecimalField(
+        'Количество в базовых единицах',
+        max_digits=14,
+        decimal_places=4,
+        default=0,
+        editable=False,
+        help_text='Граммы, миллилитры или штуки; пересчитывается при сохранении',
+    )
 
     class Meta:
         verbose_name = 'Ингредиент блюда'
@@ -377,9 +758,42 @@ class DishIngredient(models.Model):
     def __str__(self):
         return f'{self.ingredient.name} - {self.quantity} {self.ingredient.get_unit_display()}'
 
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
+    def normalize(self):
+        self.base_quantity = Decimal(self.quantity) * self.ingredient.base_unit_factor
+
     @property
     def total_calories(self):
-        return (self.ingredient.calories * self.quantity).quantize(Decimal('0.01'))
+        return (self.ingredient.calories_per_base_unit * self.base_quantity).quantize(Decimal('0.01'))
+
+
+class DailyMenuQuerySet(models.QuerySet):
+    def with_totals(self):
+        menu_calories = (
+            DailyMeal.objects
+            .filter(daily_menu=OuterRef('pk'))
+            .values('daily_menu')
+            .annotate(total=Sum('dish__calories'))
+            .values('total')
+        )
+        menu_meals = (
+            DailyMeal.objects
+            .filter(daily_menu=OuterRef('pk'))
+            .values('daily_menu')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return self.annotate(
+            annotated_calories=Coalesce(
+                Subquery(menu_calories, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            annotated_meals_count=Coalesce(Subquery(menu_meals), Value(0)),
+        )
 
 
 class DailyMenu(models.Model):
@@ -398,26 +812,43 @@ class DailyMenu(models.Model):
         auto_now_add=True,
     )
 
+    objects = DailyMenuQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Дневное меню'
         verbose_name_plural = 'Дневные меню'
         unique_together = ['user', 'date']
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date']),
+        ]
 
     def __str__(self):
         return f"Меню {self.user.username} на {self.date}"
 
+    def meals_with_dishes(self):
+        return self.meals.select_related('dish').defer(*(f'dish__{field}' for field in DISH_TEXT_FIELDS))
+
+    @cached_property
+    def nutrition(self):
+        # Суммы берутся из сохранённых итогов блюд, состав блюд при этом не читается
+        return self.meals.aggregate(**{
+            field: Coalesce(
+                Sum(f'dish__{field}'),
+                Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+            for field in NUTRIENT_FIELDS
+        })
+
     @property
     def total_calories(self):
-        total = Decimal('0')
-        for meal in self.meals.select_related('dish').all():
-            total += meal.dish.total_calories
-        return total.quantize(Decimal('0.01'))
+        return self.nutrition['calories']
 
     @property
     def total_cooking_time(self):
         total = 0
-        for meal in self.meals.select_related('dish').all():
+        for meal in self.meals_with_dishes():
             total += meal.dish.cooking_time
         return total
 
@@ -426,10 +857,16 @@ class DailyMenu(models.Model):
         return self.meals.count()
 
     @classmethod
-    def generate_for_user(cls, user):
+    def generate_for_user(cls, user, trigger='regenerate'):
         if not hasattr(user, 'subscription') or not user.subscription.is_active:
             return None
 
+        MENU_GENERATIONS.labels(trigger=trigger).inc()
+        with MENU_GENERATION_SECONDS.labels(trigger=trigger).time():
+            return cls._generate(user)
+
+    @classmethod
+    def _generate(cls, user):
         subscription = user.subscription
         today = timezone.now().date()
         cls.objects.filter(user=user, date=today).delete()
@@ -438,13 +875,14 @@ class DailyMenu(models.Model):
         available_dishes = Dish.objects.get_dishes_for_subscription(subscription)
 
         for meal_type in subscription.selected_meal_types:
-            meal_dishes = available_dishes.filter(category=meal_type)
-            if meal_dishes.exists():
-                selected_dish = random.choice(list(meal_dishes))
+            # Для случайного выбора достаточно id блюд, сами блюда в память не загружаются
+            dish_ids = list(available_dishes.filter(category=meal_type).values_list('pk', flat=True))
+            MENU_ELIGIBLE_DISHES.labels(meal_type=meal_type).observe(len(dish_ids))
+            if dish_ids:
                 DailyMeal.objects.create(
                     daily_menu=daily_menu,
                     meal_type=meal_type,
-                    dish=selected_dish,
+                    dish_id=random.choice(dish_ids),
                 )
 
         return daily_menu
@@ -458,24 +896,70 @@ class DailyMenu(models.Model):
             today = timezone.now().date()
             return cls.objects.get(user=user, date=today)
         except cls.DoesNotExist:
-            return cls.generate_for_user(user)
+            return cls.generate_for_user(user, trigger='lazy')
+
+    @classmethod
+    def get_todays_version(cls, user):
+        # Для условных запросов достаточно времени создания меню, изменения подписки и блюд меню,
+        # сами блюда не читаются. Дата окончания нужна, чтобы истечение подписки меняло версию
+        return (
+            cls.objects
+            .filter(user=user, date=timezone.now().date(), user__subscription__isnull=False)
+            .values_list('pk', 'created_at', 'user__subscription__updated_at', 'user__subscription__end_date')
+            .annotate(dishes_updated_at=Max('meals__dish__updated_at'))
+            .first()
+        )
 
     @classmethod
     def get_todays_menu_with_dishes(cls, user):
         daily_menu = cls.get_todays_menu_for_user(user)
         if daily_menu:
-            meals_dict = {
-                meal.meal_type: meal.dish
-                for meal in daily_menu.meals.select_related('dish').all()
-            }
+            meals = daily_menu.get_meal_cards()
             return {
                 'menu': daily_menu,
-                'meals': meals_dict,
+                'meals': meals,
+                'cooking_time': sum(meal['dish'].cooking_time for meal in meals),
             }
         return None
 
+    def get_meal_cards(self, preview_size=MENU_INGREDIENTS_PREVIEW):
+        # Всё, что профиль показывает о блюдах меню, собирается здесь за три запроса,
+        # шаблон не вызывает методы моделей в цикле
+        dish_ingredients = (
+            DishIngredient.objects
+            .select_related('ingredient')
+            .only('dish_id', 'quantity', 'ingredient__name', 'ingredient__unit')
+            .order_by('pk')
+        )
+        meals = {
+            meal.meal_type: meal
+            for meal in self.meals_with_dishes().prefetch_related(
+                Prefetch('dish__dishingredient_set', queryset=dish_ingredients),
+            )
+        }
+        cards = []
+        for meal_type, label in MealTypeChoices.choices:
+            if meal_type not in meals:
+                continue
+            dish = meals[meal_type].dish
+            ingredients = list(dish.dishingredient_set.all())
+            cards.append({
+                'meal_type': label,
+                'dish': dish,
+                'ingredients': [
+                    {
+                        'name': dish_ingredient.ingredient.name,
+                        'quantity': dish_ingredient.quantity,
+                        'unit': dish_ingredient.ingredient.get_unit_display(),
+                    }
+                    for dish_ingredient in ingredients[:preview_size]
+                ],
+                'more_ingredients': max(len(ingredients) - preview_size, 0),
+            })
+        return cards
+
     def get_meals_by_type(self):
-        return {meal.meal_type: meal.dish for meal in self.meals.select_related('dish').all()}
+        return {meal.meal_type: meal.dish for meal in self.meals_with_dishes()}
 
 
 class DailyMeal(models.Model):
@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+import numpy as np
+
+from planner.models import NUTRIENT_FIELDS, DailyMeal, DishIngredient
+
+NUTRIENTS = NUTRIENT_FIELDS
+
+TWO_PLACES = Decimal('0.01')
+
+
+def _to_decimal(value) -> Decimal:
+    return Decimal(str(round(float(value), 2))).quantize(TWO_PLACES)
+
+
+# Состав блюд хранится как разреженная матрица «блюда × ингредиенты» (только ненулевые элементы)
+# вместе с таблицей «ингредиенты × нутриенты»; суммы по блюдам считаются через np.bincount
+class NutritionMatrix:
+    def __init__(self, dish_ids, ingredient_index, quantities, nutrients):
+        self.dish_ids, self.dish_index = np.unique(np.asarray(dish_ids, dtype=np.int64), return_inverse=True)
+        self.ingredient_index = np.asarray(ingredient_index, dtype=np.int64)
+        self.quantities = np.asarray(quantities, dtype=np.float64)
+        self.nutrients = nutrients
+
+    @classmethod
+    def load(cls, dish_ids=None):
+        dish_ingredients = DishIngredient.objects.all()
+        if dish_ids is not None:
+            dish_ingredients = dish_ingredients.filter(dish_id__in=dish_ids)
+        rows = list(dish_ingredients.values_list('dish_id', 'ingredient_id', 'base_quantity', *(
+            f'ingredient__{nutrient}_per_base_unit' for nutrient in NUTRIENTS
+        )))
+        if not rows:
+            return cls([], [], [], np.zeros((0, len(NUTRIENTS))))
+
+        columns = np.array(rows, dtype=np.float64)
+        ingredient_ids, ingredient_index = np.unique(columns[:, 1].astype(np.int64), return_inverse=True)
+        nutrients = np.zeros((len(ingredient_ids), len(NUTRIENTS)))
+        nutrients[ingredient_index] = columns[:, 3:]
+        return cls(columns[:, 0], ingredient_index, columns[:, 2], nutrients)
+
+    def dish_totals(self) -> np.ndarray:
+        contributions = self.quantities[:, None] * self.nutrients[self.ingredient_index]
+        return np.column_stack([
+            np.bincount(self.dish_index, weights=contributions[:, column], minlength=len(self.dish_ids))
+            for column in range(len(NUTRIENTS))
+        ])
+
+    def totals_for(self, dish_ids) -> np.ndarray:
+        dish_ids = np.asarray(dish_ids, dtype=np.int64)
+        totals = np.zeros((len(dish_ids), len(NUTRIENTS)))
+        if not len(self.dish_ids) or not len(dish_ids):
+            return totals
+        positions = np.searchsorted(self.dish_ids, dish_ids).clip(max=len(self.dish_ids) - 1)
+        found = self.dish_ids[positions] == dish_ids
+        totals[found] = self.dish_totals()[positions[found]]
+        return totals
+
+
+def dish_nutrition(dish_ids) -> dict[int, dict[str, Decimal]]:
+    dish_ids = list(dish_ids)
+    totals = NutritionMatrix.load(dish_ids).totals_for(dish_ids)
+    return {
+        dish_id: {nutrient: _to_decimal(value) for nutrient, value in zip(NUTRIENTS, row)}
+        for dish_id, row in zip(dish_ids, totals)
+    }
+
+
+def ingredient_nutrition(dish_ingredients) -> list[dict[str, Decimal]]:
+    dish_ingredients = list(dish_ingredients)
+    quantities = np.array([float(di.base_quantity) for di in dish_ingredients], dtype=np.float64)
+    nutrients = np.array(
+        [[float(getattr(di.ingredient, f'{nutrient}_per_base_unit')) for nutrient in NUTRIENTS] for di in dish_ingredients],
+        dtype=np.float64,
+    ).reshape(len(dish_ingredients), len(NUTRIENTS))
+    return [
+        {nutrient: _to_decimal(value) for nutrient, value in zip(NUTRIENTS, row)}
+        for row in quantities[:, None] * nutrients
+    ]
+
+
+def menu_nutrition(menu_ids) -> dict[int, dict[str, Decimal]]:
+    menu_ids = list(menu_ids)
+    meals = np.array(
+        list(DailyMeal.objects.filter(daily_menu_id__in=menu_ids).values_list('daily_menu_id', 'dish_id')),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    menu_totals = np.zeros((len(menu_ids), len(NUTRIENTS)))
+    if len(meals):
+        dish_totals = NutritionMatrix.load(np.unique(meals[:, 1]).tolist()).totals_for(meals[:, 1])
+        menu_ids_array = np.asarray(menu_ids, dtype=np.int64)
+        order = np.argsort(menu_ids_array)
+        menu_index = order[np.searchsorted(menu_ids_array[order], meals[:, 0])]
+        for column in range(len(NUTRIENTS)):
+            menu_totals[:, column] = np.bincount(
+                menu_index, weights=dish_totals[:, column], minlength=len(menu_ids),
+            )
+    return {
+        menu_id: {nutrient: _to_decimal(value) for nutrient, value in zip(NUTRIENTS, row)}
+        for menu_id, row in zip(menu_ids, menu_totals)
+    }
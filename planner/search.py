@@ -0,0 +1,160 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from planner.models import Dish
+
+SEARCH_PAGE_SIZE = 20
+
+SQLITE_TABLE = 'planner_dish_fts'
+POSTGRES_TABLE = 'planner_dish_search'
+
+# Веса полей при ранжировании: совпадение в названии важнее совпадения в рецепте
+SQLITE_WEIGHTS = (10.0, 2.0, 1.0, 4.0)
+
+INGREDIENT_NAMES_SQL = (
+    'SELECT {aggregate} FROM planner_dishingredient di '
+    'JOIN planner_ingredient i ON i.id = di.ingredient_id WHERE di.dish_id = d.id'
+)
+
+# SQLite не умеет стемминг русского языка, поэтому у слов запроса отбрасывается окончание
+# и они ищутся как префиксы: «курицей» находит и «курица», и «курицу». Однокоренные слова
+# с изменённой основой («куриный» для «курица») так не находятся
+RUSSIAN_ENDINGS = sorted(
+    (
+        'ыми', 'ими', 'ого', 'его', 'ому', 'ему', 'ами', 'ями', 'ией', 'иям', 'иях',
+        'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ым', 'им', 'ых', 'их',
+        'ов', 'ев', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю', 'ию',
+        'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+    ),
+    key=len,
+    reverse=True,
+)
+MIN_STEM_LENGTH = 3
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _stem(word: str) -> str:
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def _sqlite_match_query(query: str) -> str:
+    return ' '.join(f'"{_stem(word)}"*' for word in WORD_RE.findall(query.lower()))
+
+
+def _index_sql(vendor: str, where: str) -> str:
+    if vendor == 'sqlite':
+        ingredients = INGREDIENT_NAMES_SQL.format(aggregate="group_concat(i.name, ' ')")
+        return (
+            f'INSERT INTO {SQLITE_TABLE} (rowid, name, description, recipe, ingredients) '
+            f"SELECT d.id, d.name, d.description, d.recipe, COALESCE(({ingredients}), '') "
+            f'FROM planner_dish d {where}'
+        )
+    ingredients = INGREDIENT_NAMES_SQL.format(aggregate="string_agg(i.name, ' ')")
+    return (
+        f'INSERT INTO {POSTGRES_TABLE} (dish_id, document) '
+        "SELECT d.id, "
+        "setweight(to_tsvector('russian', d.name), 'A') || "
+        f"setweight(to_tsvector('russian', COALESCE(({ingredients}), '')), 'B') || "
+        "setweight(to_tsvector('russian', d.description), 'B') || "
+        "setweight(to_tsvector('russian', d.recipe), 'C') "
+        f'FROM planner_dish d {where}'
+    )
+
+
+def _id_column(vendor: str) -> str:
+    return 'rowid' if vendor == 'sqlite' else 'dish_id'
+
+
+def _table(vendor: str) -> str:
+    return SQLITE_TABLE if vendor == 'sqlite' else POSTGRES_TABLE
+
+
+def rebuild_search_index(using_connection=connection):
+    vendor = using_connection.vendor
+    if vendor not in ('sqlite', 'postgresql'):
+        return
+    with using_connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {_table(vendor)}')
+        cursor.execute(_index_sql(vendor, ''))
+
+
+def index_dishes(dish_ids):
+    dish_ids = list(dish_ids)
+    vendor = connection.vendor
+    if not dish_ids or vendor not in ('sqlite', 'postgresql'):
+        return
+    placeholders = ', '.join(['%s'] * len(dish_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {_table(vendor)} WHERE {_id_column(vendor)} IN ({placeholders})', dish_ids)
+        cursor.execute(_index_sql(vendor, f'WHERE d.id IN ({placeholders})'), dish_ids)
+
+
+def remove_dishes(dish_ids):
+    dish_ids = list(dish_ids)
+    vendor = connection.vendor
+    if not dish_ids or vendor not in ('sqlite', 'postgresql'):
+        return
+    placeholders = ', '.join(['%s'] * len(dish_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {_table(vendor)} WHERE {_id_column(vendor)} IN ({placeholders})', dish_ids)
+
+
+def _ranked_sql(vendor: str, eligible_sql: str) -> tuple[str, str]:
+    if vendor == 'sqlite':
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+        source = (
+            f'FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s AND EXISTS ({eligible_sql})'
+        )
+        return (
+            f'SELECT rowid, COUNT(*) OVER () FROM (SELECT rowid, bm25({SQLITE_TABLE}, {weights}) AS score {source}) '
+            'ORDER BY score LIMIT %s OFFSET %s',
+            f'SELECT COUNT(*) {source}',
+        )
+    source = (
+        f"FROM {POSTGRES_TABLE} s, websearch_to_tsquery('russian', %s) q "
+        f'WHERE s.document @@ q AND EXISTS ({eligible_sql})'
+    )
+    return (
+        f'SELECT s.dish_id, COUNT(*) OVER () {source} ORDER BY ts_rank(s.document, q) DESC, s.dish_id LIMIT %s OFFSET %s',
+        f'SELECT COUNT(*) {source}',
+    )
+
+
+def search_dishes(queryset, query: str, page: int = 1, page_size: int = SEARCH_PAGE_SIZE) -> tuple[list, int]:
+    vendor = connection.vendor
+    offset = (page - 1) * page_size
+
+    if vendor not in ('sqlite', 'postgresql'):
+        matches = queryset.filter(name__icontains=query).order_by('name')
+        return list(matches[offset:offset + page_size]), matches.count()
+
+    match_query = _sqlite_match_query(query) if vendor == 'sqlite' else query
+    if not match_query.strip():
+        return [], 0
+
+    # Доступность проверяется коррелированным подзапросом только для найденных блюд,
+    # а не построением списка всех доступных блюд каталога
+    indexed_id = f'{SQLITE_TABLE}.rowid' if vendor == 'sqlite' else 's.dish_id'
+    eligible = queryset.order_by().filter(pk=RawSQL(indexed_id, ())).values('pk')
+    eligible_sql, eligible_params = eligible.query.sql_with_params()
+    ranked_sql, count_sql = _ranked_sql(vendor, eligible_sql)
+    with connection.cursor() as cursor:
+        cursor.execute(ranked_sql, [match_query, *eligible_params, page_size, offset])
+        rows = cursor.fetchall()
+        if rows:
+            total = rows[0][1]
+        else:
+            # За пределами последней страницы оконная функция ничего не вернёт, общее число считается отдельно
+            cursor.execute(count_sql, [match_query, *eligible_params])
+            total = cursor.fetchone()[0]
+
+    ranked_ids = [row[0] for row in rows]
+
+    dishes = Dish.objects.for_listing().in_bulk(ranked_ids)
+    return [dishes[dish_id] for dish_id in ranked_ids if dish_id in dishes], total
@@ -0,0 +1,58 @@
+from typing import Any
+
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from planner.forms import SubscriptionForm
+from planner.models import MealTypeChoices, SubscriptionPlan, UserSubscription
+
+User = get_user_model()
+
+
+def validate_subscription_data(subs_data: dict[str, Any]) -> tuple[int, int, list]:
+    try:
+        term = int(subs_data.get('term', 0))
+        persons_count = int(subs_data.get('persons', 1))
+    except (TypeError, ValueError):
+        raise ValidationError('Неверный формат данных')
+    if not term or term not in {choice[0] for choice in SubscriptionPlan.DURATION_CHOICES}:
+        raise ValidationError('Неизвестная продолжительность подписки.')
+    if persons_count not in {choice[0] for choice in SubscriptionForm.PERSONS_CHOICES}:
+        raise ValidationError('Неверное количество персон.')
+    selected_meals = [
+        meal_type for meal_type in MealTypeChoices
+        if subs_data.get(str(meal_type.value)) in {'True', True}
+    ]
+    if not selected_meals:
+        raise ValidationError('Должен быть выбран хотя бы один приём пищи.')
+    return term, persons_count, selected_meals
+
+
+def create_subscription(
+    user: User,
+    subscription_data: dict[str, Any],
+) -> UserSubscription:
+    term, persons_count, selected_meals = validate_subscription_data(subscription_data)
+    subscription = UserSubscription.objects.filter(user=user).first()
+    if subscription is None:
+        subscription = UserSubscription(user=user)
+        starts_from = timezone.now().date()
+    elif subscription.is_active:
+        # Оплата при действующей подписке продлевает её с даты окончания
+        starts_from = subscription.end_date
+    else:
+        # Закончившаяся подписка начинается заново, в том числе для сводок по активным подпискам
+        starts_from = subscription.start_date = timezone.now().date()
+    subscription.diet_type = subscription_data['foodtype']
+    subscription.selected_meal_types = selected_meals
+    subscription.persons_count = persons_count
+    subscription.plan = SubscriptionPlan.objects.get(duration=term)
+    subscription.end_date = starts_from + relativedelta(months=term)
+    subscription.is_suspended = False
+    subscription.renewal_reminder_sent_at = None
+    subscription.expiry_notice_sent_at = None
+    subscription.save()
+    subscription.allergies.set(subscription_data['allergies'])
+    return subscription
@@ -0,0 +1,61 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from planner.models import Dish, DishIngredient, Ingredient, UserSubscription
+from planner.search import index_dishes, remove_dishes
+
+
+@receiver(post_save, sender=Dish)
+def index_saved_dish(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_dishes([instance.pk])
+
+
+@receiver(post_delete, sender=Dish)
+def remove_deleted_dish(sender, instance, **kwargs):
+    remove_dishes([instance.pk])
+
+
+@receiver(post_save, sender=DishIngredient)
+@receiver(post_delete, sender=DishIngredient)
+def index_dish_ingredients(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_dishes([instance.dish_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def index_ingredient_dishes(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        index_dishes(DishIngredient.objects.filter(ingredient=instance).values_list('dish_id', flat=True).distinct())
+
+
+# Сохранённые итоги блюда зависят только от состава, поэтому пересчитываются при любом его изменении,
+# а не только из админки; пересчёт заодно обновляет updated_at блюда
+@receiver(post_save, sender=DishIngredient)
+@receiver(post_delete, sender=DishIngredient)
+def recalculate_ingredient_dish(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Dish.objects.filter(pk=instance.dish_id).recalculate_nutrition()
+
+
+@receiver(post_save, sender=Ingredient)
+def recalculate_ingredient_dishes(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        # Количества в базовых единицах зависят от единицы ингредиента и должны обновиться до пересчёта итогов
+        dish_ingredients = DishIngredient.objects.filter(ingredient=instance)
+        dish_ingredients.update(base_quantity=F('quantity') * instance.base_unit_factor)
+        Dish.objects.filter(pk__in=dish_ingredients.values('dish')).recalculate_nutrition()
+
+
+@receiver(m2m_changed, sender=UserSubscription.allergies.through)
+def touch_subscription_allergies(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            UserSubscription.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+    elif action in ('post_add', 'post_remove'):
+        UserSubscription.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+    elif action == 'pre_clear':
+        # После очистки со стороны аллергии связанные подписки уже не найти
+        instance.usersubscription_set.update(updated_at=timezone.now())
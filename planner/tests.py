@@ -1,2 +1,462 @@
+import json
+import re
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template import engines
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from monitoring.querylog import assert_no_n_plus_one
+from planner.models import (
+    NUTRIENT_FIELDS,
+    Allergy,
+    DailyMeal,
+    DailyMenu,
+    DietTypeChoices,
+    Dish,
+    DishIngredient,
+    Ingredient,
+    MealTypeChoices,
+    SubscriptionPlan,
+    UserSubscription,
+)
+from planner.catalog import export_dishes, import_dishes
+from planner.nutrition import dish_nutrition, menu_nutrition
+from planner.search import search_dishes
+from planner.views import CATALOG_PAGE_SIZE, OrderView, ProfileView
+
+User = get_user_model()
+
+DISHES_PER_CATEGORY = 8
+INGREDIENTS_PER_DISH = 8
+
+
+class PlannerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Тестовый ингредиент {index}', unit='g', calories=100 + index)
+            for index in range(INGREDIENTS_PER_DISH)
+        )
+        for ingredient in ingredients:
+            ingredient.normalize()
+        Ingredient.objects.bulk_update(ingredients, ['calories_per_base_unit'])
+
+        dishes = Dish.objects.bulk_create(
+            Dish(name=f'Тестовое блюдо {category} {index}', description='', category=category)
+            for category in MealTypeChoices.values
+            for index in range(DISHES_PER_CATEGORY)
+        )
+        dish_ingredients = [
+            DishIngredient(dish=dish, ingredient=ingredient, quantity=50)
+            for dish in dishes
+            for ingredient in ingredients
+        ]
+        for dish_ingredient in dish_ingredients:
+            dish_ingredient.normalize()
+        DishIngredient.objects.bulk_create(dish_ingredients)
+        Dish.objects.filter(pk__in=[dish.pk for dish in dishes]).recalculate_nutrition()
+        cls.dish = dishes[0]
+
+        cls.user = User.objects.create_user('eater', 'eater@example.com', 'password')
+        subscription = UserSubscription(
+            user=cls.user,
+            diet_type='classic',
+            plan=SubscriptionPlan.objects.get(duration=1),
+            end_date=timezone.now().date() + timedelta(days=30),
+        )
+        subscription.selected_meal_types = MealTypeChoices.values
+        subscription.save()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+
+class NPlusOneTests(PlannerTestCase):
+    def test_profile(self):
+        with assert_no_n_plus_one():
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.user.daily_menus.get().meals.count(), len(MealTypeChoices))
+
+    def test_dish_catalog(self):
+        with assert_no_n_plus_one():
+            response = self.client.get(reverse('dish_catalog'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Тестовое блюдо')
+
+    def test_dish_catalog_api(self):
+        with assert_no_n_plus_one():
+            response = self.client.get(reverse('dish_catalog_api'))
+        data = response.json()
+        self.assertEqual(len(data['results']), CATALOG_PAGE_SIZE)
+        self.assertIsNotNone(data['next'])
+
+    def test_dish_detail(self):
+        with assert_no_n_plus_one():
+            response = self.client.get(reverse('dish_detail', args=[self.dish.pk]))
+        self.assertContains(response, 'Тестовый ингредиент 7')
+
+    def test_helper_detects_n_plus_one(self):
+        with self.assertRaisesMessage(AssertionError, 'возможен N+1'):
+            with assert_no_n_plus_one():
+                for dish in Dish.objects.filter(category=MealTypeChoices.LUNCH):
+                    list(dish.dishingredient_set.all())
+
+
+class ProfileMenuApiConditionalTests(PlannerTestCase):
+    def get_etag(self):
+        response = self.client.get(reverse('profile_api'))
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNotModified(self, etag):
+        response = self.client.get(reverse('profile_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def assertModified(self, etag):
+        response = self.client.get(reverse('profile_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_unchanged_menu_is_not_modified(self):
+        self.assertNotModified(self.get_etag())
+
+    def test_expired_subscription_changes_etag(self):
+        etag = self.get_etag()
+        # Дата окончания прошла без сохранения подписки: updated_at не меняется
+        UserSubscription.objects.filter(user=self.user).update(
+            end_date=timezone.now().date() - timedelta(days=1),
+            updated_at=self.user.subscription.updated_at,
+        )
+
+        response = self.assertModified(etag)
+        self.assertFalse(response.json()['subscription']['is_active'])
+
+    def test_suspended_subscription_changes_etag(self):
+        etag = self.get_etag()
+        subscription = UserSubscription.objects.get(user=self.user)
+        subscription.is_suspended = True
+        subscription.save()
+
+        response = self.assertModified(etag)
+        self.assertFalse(response.json()['subscription']['is_active'])
+
+    def test_allergy_changes_etag(self):
+        allergy = Allergy.objects.create(name='Тестовая аллергия')
+        subscription = UserSubscription.objects.get(user=self.user)
+
+        etag = self.get_etag()
+        subscription.allergies.add(allergy)
+        response = self.assertModified(etag)
+        self.assertEqual(response.json()['subscription']['allergies'], ['Тестовая аллергия'])
+
+        etag = response['ETag']
+        allergy.usersubscription_set.clear()
+        response = self.assertModified(etag)
+        self.assertEqual(response.json()['subscription']['allergies'], [])
+
+
+class TemplateEngineParityTests(PlannerTestCase):
+    def render(self, view_class):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        view = view_class()
+        view.setup(request)
+        context = view.get_context_data()
+        rendered = []
+        for engine in ('django', 'jinja2'):
+            html = engines[engine].get_template(view_class.template_name).render(context, request)
+            # CSRF-токен маскируется заново при каждом рендеринге, а теги {% load %} и {% block %}
+            # оставляют в шаблонах Django пустые строки и отступы
+            html = re.sub(r'\b[A-Za-z0-9]{64}\b', 'csrf', html)
+            rendered.append([line.strip() for line in html.splitlines() if line.strip()])
+        return rendered
+
+    def test_profile(self):
+        django_lines, jinja2_lines = self.render(ProfileView)
+        self.assertIn('Тестовое блюдо', '\n'.join(django_lines))
+        self.assertEqual(django_lines, jinja2_lines)
+
+    def test_order(self):
+        django_lines, jinja2_lines = self.render(OrderView)
+        self.assertEqual(django_lines, jinja2_lines)
+
+
+class AdminChangelistQueryTests(PlannerTestCase):
+    # Число запросов не зависит от числа строк на странице
+    CHANGELIST_QUERIES = {
+        'dailymenu': 6,
+        'dailymeal': 4,
+        'dish': 4,
+        'dishingredient': 5,
+        'ingredient': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        allergy = Allergy.objects.create(name='Тестовая аллергия')
+        for ingredient in Ingredient.objects.filter(name__startswith='Тестовый ингредиент'):
+            ingredient.allergens.add(allergy)
+        dishes = list(Dish.objects.filter(name__startswith='Тестовое блюдо'))
+        menus = DailyMenu.objects.bulk_create(
+            DailyMenu(user=user, date=timezone.now().date() - timedelta(days=days))
+            for user in (cls.user, cls.admin)
+            for days in range(5)
+        )
+        DailyMeal.objects.bulk_create(
+            DailyMeal(daily_menu=menu, meal_type=meal_type, dish=dishes[index])
+            for menu in menus
+            for index, meal_type in enumerate(MealTypeChoices.values)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelists(self):
+        for model_name, queries in self.CHANGELIST_QUERIES.items():
+            url = reverse(f'admin:planner_{model_name}_changelist')
+            with self.subTest(model_name=model_name):
+                with assert_no_n_plus_one(), self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+
+class DishNutritionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.milk = Ingredient.objects.create(name='Молоко', unit='ml', calories=60, protein=3, fat=3, carbs=5)
+        cls.oats = Ingredient.objects.create(name='Овсянка', unit='g', calories=350, protein=12, fat=6, carbs=60)
+        cls.dish = Dish.objects.create(name='Каша', description='', category=MealTypeChoices.BREAKFAST)
+        cls.milk_portion = DishIngredient.objects.create(dish=cls.dish, ingredient=cls.milk, quantity=200)
+        DishIngredient.objects.create(dish=cls.dish, ingredient=cls.oats, quantity=50)
+
+    def assertStoredNutrition(self, **expected):
+        dish = Dish.objects.get(pk=self.dish.pk)
+        self.assertEqual({field: getattr(dish, field) for field in expected}, expected)
+
+    def test_dish_ingredient_save_recalculates_dish(self):
+        self.assertStoredNutrition(calories=Decimal('295.00'), carbs=Decimal('40.00'))
+
+        self.milk_portion.quantity *= 10
+        self.milk_portion.save()
+
+        self.assertStoredNutrition(calories=Decimal('1375.00'), carbs=Decimal('130.00'))
+
+    def test_dish_ingredient_delete_recalculates_dish(self):
+        self.milk_portion.delete()
+
+        self.assertStoredNutrition(calories=Decimal('175.00'), protein=Decimal('6.00'))
+
+    def test_ingredient_nutrients_change_recalculates_dishes(self):
+        self.oats.calories = 370
+        self.oats.save()
+
+        self.assertStoredNutrition(calories=Decimal('305.00'))
+
+    def test_ingredient_unit_change_recalculates_dishes(self):
+        # 200 ст. л. молока по 60 ккал за ложку вместо 200 мл по 60 ккал на 100 мл
+        self.milk.unit = 'tbsp'
+        self.milk.save()
+
+        self.milk_portion.refresh_from_db()
+        self.assertEqual(self.milk_portion.base_quantity, Decimal('3000'))
+        self.assertStoredNutrition(calories=Decimal('12175.00'), carbs=Decimal('1030.00'))
+
+    def test_engine_matches_stored_totals(self):
+        user = User.objects.create_user('taster', 'taster@example.com', 'password')
+        menu = DailyMenu.objects.create(user=user)
+        DailyMeal.objects.create(daily_menu=menu, meal_type=MealTypeChoices.BREAKFAST, dish=self.dish)
+        empty_menu = DailyMenu.objects.create(user=user, date=timezone.now().date() - timedelta(days=1))
+
+        dish = Dish.objects.get(pk=self.dish.pk)
+        self.assertEqual(dish.total_calories, dish.calories)
+        self.assertEqual(dish_nutrition([dish.pk]), {dish.pk: {field: getattr(dish, field) for field in NUTRIENT_FIELDS}})
+        self.assertEqual(menu_nutrition([menu.pk, empty_menu.pk]), {
+            menu.pk: menu.nutrition,
+            empty_menu.pk: dict.fromkeys(NUTRIENT_FIELDS, Decimal('0.00')),
+        })
+
+
+class AdminFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_autocomplete_filter_rejects_invalid_value(self):
+        for url, parameter in (
+            (reverse('admin:planner_dailymenu_changelist'), 'user__id__exact'),
+            (reverse('admin:planner_dailymeal_changelist'), 'daily_menu__id__exact'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, {parameter: 'abc'})
+                self.assertRedirects(response, f'{url}?e=1', fetch_redirect_response=False)
+
+    def test_autocomplete_filter_applies_valid_value(self):
+        menu = DailyMenu.objects.create(user=self.admin)
+        other_menu = DailyMenu.objects.create(user=User.objects.create_user('other', 'other@example.com', 'password'))
+
+        response = self.client.get(reverse('admin:planner_dailymenu_changelist'), {'user__id__exact': self.admin.pk})
+
+        self.assertContains(response, reverse('admin:planner_dailymenu_change', args=[menu.pk]))
+        self.assertNotContains(response, reverse('admin:planner_dailymenu_change', args=[other_menu.pk]))
+
+        response = self.client.get(reverse('admin:planner_dailymeal_changelist'), {'daily_menu__id__exact': menu.pk})
+        self.assertEqual(response.status_code, 200)
+
+
+class DishCatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        milk = Ingredient.objects.create(name='Молоко', unit='ml', calories=60, protein=3, fat=3, carbs=5)
+        oats = Ingredient.objects.create(name='Овсянка', unit='g', calories=350, protein=12, fat=6, carbs=60)
+        cls.dish = Dish.objects.create(
+            name='Каша', description='Овсяная каша', category=MealTypeChoices.BREAKFAST, cooking_time=15, portions=2,
+        )
+        DishIngredient.objects.create(dish=cls.dish, ingredient=milk, quantity=200)
+        DishIngredient.objects.create(dish=cls.dish, ingredient=oats, quantity=50)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def export(self, dish=None):
+        dishes = Dish.objects.filter(pk=(dish or self.dish).pk)
+        return json.loads(json.dumps(export_dishes(dishes), cls=DjangoJSONEncoder))
+
+    def run_action(self, action, **data):
+        return self.client.post(reverse('admin:planner_dish_changelist'), {
+            'action': action,
+            '_selected_action': [self.dish.pk],
+            **data,
+        })
+
+    def test_set_diet_type_and_category(self):
+        self.run_action('set_diet_type', diet_type=DietTypeChoices.KETO)
+        self.run_action('set_category', category=MealTypeChoices.DINNER)
+
+        self.dish.refresh_from_db()
+        self.assertEqual((self.dish.diet_type, self.dish.category), (DietTypeChoices.KETO, MealTypeChoices.DINNER))
+
+    def test_scale_ingredients(self):
+        self.run_action('scale_ingredients', factor='2')
+
+        self.dish.refresh_from_db()
+        self.assertEqual(self.dish.calories, Decimal('590.00'))
+        self.assertEqual(
+            sorted(self.dish.dishingredient_set.values_list('quantity', flat=True)),
+            [Decimal('100'), Decimal('400')],
+        )
+
+    def test_recalculate_nutrition(self):
+        Dish.objects.filter(pk=self.dish.pk).update(calories=0)
+
+        self.run_action('recalculate_nutrition')
+
+        self.dish.refresh_from_db()
+        self.assertEqual(self.dish.calories, Decimal('295.00'))
+
+    def test_export_import_round_trip(self):
+        response = self.run_action('export_to_json')
+        data = json.loads(response.content)
+        self.assertEqual(data, self.export())
+
+        self.assertEqual(import_dishes(data), 1)
+
+        imported = Dish.objects.filter(name='Каша').exclude(pk=self.dish.pk).get()
+        self.assertEqual(self.export(imported), data)
+        self.assertEqual(imported.calories, Decimal('295.00'))
+        self.assertEqual(Ingredient.objects.filter(name__in=['Молоко', 'Овсянка']).count(), 2)
+
+    def test_import_matches_ingredients_by_unit(self):
+        data = self.export()
+        data[0]['ingredients'][0].update(unit='pcs', quantity=2)
+
+        import_dishes(data)
+
+        self.assertEqual(
+            sorted(Ingredient.objects.filter(name='Молоко').values_list('unit', flat=True)),
+            ['ml', 'pcs'],
+        )
+
+    def test_import_rejects_invalid_dish_fields(self):
+        for field, value in (('difficulty', 'impossible'), ('cooking_time', -5), ('portions', -1)):
+            data = self.export()
+            data[0][field] = value
+            with self.subTest(field=field), self.assertRaisesMessage(ValidationError, field):
+                import_dishes(data)
+
+    def test_import_rejects_duplicate_ingredient(self):
+        data = self.export()
+        data[0]['ingredients'].append(data[0]['ingredients'][0])
+
+        with self.assertRaisesMessage(ValidationError, 'указан несколько раз'):
+            import_dishes(data)
+        self.assertEqual(Dish.objects.filter(name='Каша').count(), 1)
+
+
+class DishSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rice = Ingredient.objects.create(name='Рис басмати', unit='g', calories=350)
+        cls.dish = Dish.objects.create(
+            name='Курица с рисом',
+            description='Запечённое филе',
+            recipe='Обжарить и потушить',
+            category=MealTypeChoices.LUNCH,
+        )
+        DishIngredient.objects.create(dish=cls.dish, ingredient=cls.rice, quantity=150)
+
+    def search(self, query, queryset=None):
+        dishes, _ = search_dishes(Dish.objects.all() if queryset is None else queryset, query)
+        return [dish.pk for dish in dishes]
+
+    def test_finds_dish_by_name_word_forms(self):
+        for query in ('курица', 'курицей', 'КУРИЦУ'):
+            with self.subTest(query=query):
+                self.assertIn(self.dish.pk, self.search(query))
+
+    def test_finds_dish_by_ingredient(self):
+        self.assertIn(self.dish.pk, self.search('басмати'))
+
+    def test_empty_query(self):
+        self.assertEqual(search_dishes(Dish.objects.all(), '  '), ([], 0))
+
+    def test_respects_queryset(self):
+        self.assertNotIn(self.dish.pk, self.search('курица', Dish.objects.exclude(pk=self.dish.pk)))
+
+    def test_dish_save_updates_index(self):
+        self.dish.name = 'Индейка с рисом'
+        self.dish.save()
+
+        self.assertIn(self.dish.pk, self.search('индейка'))
+        self.assertNotIn(self.dish.pk, self.search('курица'))
+
+    def test_dish_delete_removes_from_index(self):
+        dish_id = self.dish.pk
+        self.dish.delete()
+
+        self.assertNotIn(dish_id, self.search('курица'))
+
+    def test_dish_ingredient_add_updates_index(self):
+        saffron = Ingredient.objects.create(name='Шафран', unit='g', calories=310)
+        DishIngredient.objects.create(dish=self.dish, ingredient=saffron, quantity=1)
+
+        self.assertIn(self.dish.pk, self.search('шафран'))
+
+    def test_ingredient_rename_updates_index(self):
+        self.rice.name = 'Рис жасмин'
+        self.rice.save()
+
+        self.assertIn(self.dish.pk, self.search('жасмин'))
+        self.assertNotIn(self.dish.pk, self.search('басмати'))
@@ -6,7 +6,11 @@ urlpatterns = [
     path('order/', views.OrderView.as_view(), name='order'),
     path('order/calculate/', views.CalculateSubscription.as_view(), name='order_calculate'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
+    path('profile/api/', views.ProfileMenuApiView.as_view(), name='profile_api'),
     path('profile/upload-avatar/', views.UploadAvatarView.as_view(), name='upload_avatar'),
     path('profile/menu/regenerate', views.RegenerateMenuView.as_view(), name='regenerate_menu'),
+    path('dish/', views.DishCatalogView.as_view(), name='dish_catalog'),
+    path('dish/api/', views.DishCatalogApiView.as_view(), name='dish_catalog_api'),
+    path('dish/search/', views.DishSearchView.as_view(), name='dish_search'),
     path('dish/<int:pk>/', views.DishDetailView.as_view(), name='dish_detail'),
 ]
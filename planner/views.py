@@ -1,62 +1,51 @@
+import hashlib
 import json
+from datetime import UTC, datetime, time, timedelta
 from typing import Any
 
-from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model, update_session_auth_hash
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError
-from django.http import JsonResponse
+from django.db.models import Prefetch
+from django.http import Http404, JsonResponse
 from django.shortcuts import redirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views import View
-from django.views.generic import DetailView, FormView
-
-from planner.forms import SubscriptionForm, UserProfileForm
-from planner.models import DailyMenu, Dish, MealTypeChoices, SubscriptionPlan, UserProfile, UserSubscription
+from django.views.generic import DetailView, FormView, TemplateView
+
+from monitoring.metrics import PRICE_CALCULATIONS
+from planner.forms import DishCatalogFilterForm, SubscriptionForm, UserProfileForm
+from planner.models import (
+    SUBSCRIPTION_RENEWAL_DAYS,
+    DailyMenu,
+    Dish,
+    DishIngredient,
+    MealTypeChoices,
+    SubscriptionPlan,
+    UserProfile,
+    UserSubscription,
+)
+from planner.search import SEARCH_PAGE_SIZE, search_dishes
+from planner.services import validate_subscription_data
 
 User = get_user_model()
 
+CATALOG_PAGE_SIZE = 24
+
+
+class SelectableTemplateEngineMixin:
+    # Шаблоны из JINJA2_TEMPLATES рендерятся Jinja2 (каталог jinja2/), остальные - шаблонами Django
+    @property
+    def template_engine(self):
+        return 'jinja2' if self.template_name in settings.JINJA2_TEMPLATES else 'django'
+
 
-def _validate_subscription_data(subs_data: dict[str, Any]) -> tuple[int, int, list]:
-    try:
-        term = int(subs_data.get('term', 0))
-        persons_count = int(subs_data.get('persons', 1))
-    except (TypeError, ValueError):
-        raise ValidationError('Неверный формат данных')
-    if not term or term not in {choice[0] for choice in SubscriptionPlan.DURATION_CHOICES}:
-        raise ValidationError('Неизвестная продолжительность подписки.')
-    if persons_count not in {choice[0] for choice in SubscriptionForm.PERSONS_CHOICES}:
-        raise ValidationError('Неверное количество персон.')
-    selected_meals = [
-        meal_type for meal_type in MealTypeChoices
-        if subs_data.get(str(meal_type.value)) in {'True', True}
-    ]
-    if not selected_meals:
-        raise ValidationError('Должен быть выбран хотя бы один приём пищи.')
-    return term, persons_count, selected_meals
-
-
-def create_subscription(
-    user: User,
-    subscription_data: dict[str, Any],
-) -> UserSubscription:
-    term, persons_count, selected_meals = _validate_subscription_data(subscription_data)
-    subscription = UserSubscription.objects.create(
-        user=user,
-        diet_type=subscription_data['foodtype'],
-        selected_meal_types=selected_meals,
-        persons_count=persons_count,
-        plan=SubscriptionPlan.objects.get(duration=term),
-        end_date=timezone.now().date() + relativedelta(months=term),
-    )
-    subscription.allergies.set(subscription_data['allergies'])
-    subscription.save()
-    return subscription
-
-
-class OrderView(FormView):
+class OrderView(SelectableTemplateEngineMixin, FormView):
     template_name = 'order.html'
     form_class = SubscriptionForm
     success_url = reverse_lazy('profile')
@@ -76,7 +65,9 @@ class OrderView(FormView):
             )
             return redirect('login')
 
-        if UserSubscription.objects.filter(user=self.request.user).exists():
+        # Подписку, которая скоро закончится или уже закончилась, можно продлить
+        renewal_date = timezone.now().date() + timedelta(days=SUBSCRIPTION_RENEWAL_DAYS)
+        if UserSubscription.objects.active().filter(user=self.request.user, end_date__gt=renewal_date).exists():
             messages.warning(self.request, 'У Вас уже есть оплаченная подписка.')
             return redirect('profile')
 
@@ -86,6 +77,7 @@ class OrderView(FormView):
             cleaned_data['allergies'] = [allergy.id for allergy in cleaned_data['allergies']]
         cleaned_data['description'] = f'Подписка FoodPlan на {SubscriptionPlan.get_duration_display_by_value(term)}'
         self.request.session['pending_subscription'] = cleaned_data
+        self.request.session.pop('yookassa_idempotency_key', None)
         return redirect('yookassa_payment')
 
 
@@ -93,21 +85,26 @@ class CalculateSubscription(View):
     def post(self, request):
         try:
             subs_data = json.loads(request.body)
-            term, persons_count, selected_meals = _validate_subscription_data(subs_data)
+            term, persons_count, selected_meals = validate_subscription_data(subs_data)
             plan = SubscriptionPlan.objects.get(duration=term)
             total_price = plan.total_price(selected_meals) * persons_count
+            PRICE_CALCULATIONS.labels(outcome='ok').inc()
             return JsonResponse({'totalPrice': total_price}, status=200)
         except json.JSONDecodeError:
+            PRICE_CALCULATIONS.labels(outcome='invalid').inc()
             return JsonResponse({'error': 'Неверный формат JSON'}, status=400)
         except ValidationError as error:
+            PRICE_CALCULATIONS.labels(outcome='invalid').inc()
             return JsonResponse({'error': str(error)}, status=400)
         except SubscriptionPlan.DoesNotExist:
+            PRICE_CALCULATIONS.labels(outcome='unknown_plan').inc()
             return JsonResponse({'error': 'Выбранный план подписки не найден'}, status=400)
         except Exception:
+            PRICE_CALCULATIONS.labels(outcome='error').inc()
             return JsonResponse({'error': 'Внутренняя ошибка сервера'}, status=500)
 
 
-class ProfileView(LoginRequiredMixin, FormView):
+class ProfileView(LoginRequiredMixin, SelectableTemplateEngineMixin, FormView):
     template_name = 'profile.html'
     form_class = UserProfileForm
     success_url = reverse_lazy('profile')
@@ -125,8 +122,10 @@ class ProfileView(LoginRequiredMixin, FormView):
         if menu_data:
             context['daily_menu'] = menu_data['menu']
             context['daily_meals'] = menu_data['meals']
+            context['total_cooking_time'] = menu_data['cooking_time']
 
-        context['meal_types'] = MealTypeChoices.choices
+        if hasattr(user, 'subscription'):
+            context['allergies'] = user.subscription.get_allergies_list()
 
         return context
 
@@ -171,7 +170,37 @@ class RegenerateMenuView(LoginRequiredMixin, View):
         return redirect('profile')
 
 
-class DishDetailView(LoginRequiredMixin, DetailView):
+def _version_validators(key, *updated) -> tuple[str, int]:
+    updated = [timestamp for timestamp in updated if timestamp is not None]
+    version = ':'.join([str(key), *(str(timestamp.timestamp()) for timestamp in updated)])
+    etag = quote_etag(hashlib.md5(version.encode(), usedforsecurity=False).hexdigest())
+    return etag, int(max(updated).timestamp())
+
+
+def _menu_validators(menu_id, created_at, subscription_updated_at, end_date, dishes_updated_at) -> tuple[str, int]:
+    # Истечение подписки не меняет updated_at, поэтому момент окончания входит в версию отдельно
+    expired_at = None
+    if end_date < timezone.now().date():
+        expired_at = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=UTC)
+    return _version_validators(menu_id, created_at, subscription_updated_at, dishes_updated_at, expired_at)
+
+
+class ConditionalResponseMixin:
+    def get_not_modified_response(self, etag, last_modified):
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return self.add_validators(response, etag, last_modified)
+        return None
+
+    def add_validators(self, response, etag, last_modified):
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        # Данные личные: общие кэши их не хранят, а браузер каждый раз сверяет ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class DishDetailView(LoginRequiredMixin, ConditionalResponseMixin, DetailView):
     model = Dish
     template_name = 'dish_detail.html'
     context_object_name = 'dish'
@@ -180,3 +209,162 @@ class DishDetailView(LoginRequiredMixin, DetailView):
         if hasattr(self.request.user, 'subscription'):
             return Dish.objects.get_dishes_for_subscription(self.request.user.subscription)
         return Dish.objects.none()
+
+    def get(self, request, *args, **kwargs):
+        # Доступность блюда проверяется тем же запросом, что и его версия,
+        # поэтому неизменившаяся страница отдаётся с 304 без чтения ингредиентов и рендеринга
+        updated_at = self.get_queryset().filter(pk=kwargs['pk']).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            raise Http404('Блюдо не найдено')
+
+        validators = _version_validators(kwargs['pk'], updated_at)
+        response = self.get_not_modified_response(*validators)
+        if response is not None:
+            return response
+        return self.add_validators(super().get(request, *args, **kwargs), *validators)
+
+    def get_object(self, queryset=None):
+        # Ингредиенты со своими названиями и единицами загружаются одним запросом для всего списка
+        dish_ingredients = DishIngredient.objects.select_related('ingredient')
+        return super().get_object(
+            self.get_queryset().prefetch_related(Prefetch('dishingredient_set', queryset=dish_ingredients)),
+        )
+
+
+def _dish_summary(dish: Dish) -> dict[str, Any]:
+    return {
+        'id': dish.pk,
+        'name': dish.name,
+        'category': dish.get_category_display(),
+        'diet_type': dish.get_diet_type_display(),
+        'cooking_time': dish.cooking_time,
+        'difficulty': dish.get_difficulty_display(),
+        'calories': float(dish.calories),
+        'photo': dish.photo.url if dish.photo else None,
+        'url': reverse('dish_detail', args=[dish.pk]),
+    }
+
+
+class DishSearchView(LoginRequiredMixin, View):
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            return JsonResponse({'error': 'Неверный номер страницы'}, status=400)
+
+        if not query or not hasattr(request.user, 'subscription'):
+            return JsonResponse({'results': [], 'count': 0, 'page': page, 'pages': 0})
+
+        available_dishes = Dish.objects.get_dishes_for_subscription(request.user.subscription)
+        dishes, count = search_dishes(available_dishes, query, page=page)
+        return JsonResponse({
+            'results': [_dish_summary(dish) for dish in dishes],
+            'count': count,
+            'page': page,
+            'pages': -(-count // SEARCH_PAGE_SIZE),
+        })
+
+
+class DishCatalogMixin(LoginRequiredMixin):
+    page_size = CATALOG_PAGE_SIZE
+
+    def get_catalog_page(self, form):
+        if not hasattr(self.request.user, 'subscription'):
+            return [], None
+
+        # Пагинация по ключу: следующая страница начинается после последнего показанного id,
+        # поэтому глубокие страницы не просматривают пропущенные строки, как при OFFSET
+        dishes = form.filter_queryset(
+            Dish.objects.get_dishes_for_subscription(self.request.user.subscription),
+        ).for_listing().order_by('pk')
+        dishes = list(dishes[:self.page_size + 1])
+        if len(dishes) > self.page_size:
+            dishes = dishes[:self.page_size]
+            return dishes, dishes[-1].pk
+        return dishes, None
+
+
+class DishCatalogView(DishCatalogMixin, TemplateView):
+    template_name = 'dish_catalog.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = DishCatalogFilterForm(self.request.GET, subscription=getattr(self.request.user, 'subscription', None))
+        dishes, next_cursor = self.get_catalog_page(form) if form.is_valid() else ([], None)
+
+        context['form'] = form
+        context['dishes'] = dishes
+        if next_cursor is not None:
+            next_query = self.request.GET.copy()
+            next_query['after'] = next_cursor
+            context['next_query'] = next_query.urlencode()
+        return context
+
+
+class DishCatalogApiView(DishCatalogMixin, View):
+    def get(self, request):
+        form = DishCatalogFilterForm(request.GET, subscription=getattr(request.user, 'subscription', None))
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        dishes, next_cursor = self.get_catalog_page(form)
+        return JsonResponse({
+            'results': [_dish_summary(dish) for dish in dishes],
+            'next': next_cursor,
+        })
+
+
+class ProfileMenuApiView(LoginRequiredMixin, ConditionalResponseMixin, View):
+    def get(self, request):
+        # Меню меняется не чаще раза в день, поэтому повторный запрос с тем же ETag
+        # получает 304 по одному запросу к БД, без чтения блюд
+        version = DailyMenu.get_todays_version(request.user)
+        if version:
+            response = self.get_not_modified_response(*_menu_validators(*version))
+            if response is not None:
+                return response
+
+        if not hasattr(request.user, 'subscription'):
+            return JsonResponse({'subscription': None, 'menu': None})
+
+        subscription = request.user.subscription
+        menu_data = DailyMenu.get_todays_menu_with_dishes(request.user)
+        response = JsonResponse({
+            'subscription': {
+                'diet_type': subscription.get_diet_type_display(),
+                'meal_types': [MealTypeChoices(meal_type).label for meal_type in subscription.selected_meal_types],
+                'persons_count': subscription.persons_count,
+                'allergies': subscription.get_allergies_list(),
+                'end_date': subscription.end_date,
+                'is_active': subscription.is_active,
+            },
+            'menu': self.serialize_menu(menu_data) if menu_data else None,
+        })
+        if menu_data:
+            menu = menu_data['menu']
+            dishes_updated_at = max((meal['dish'].updated_at for meal in menu_data['meals']), default=None)
+            response = self.add_validators(response, *_menu_validators(
+                menu.pk, menu.created_at, subscription.updated_at, subscription.end_date, dishes_updated_at,
+            ))
+        return response
+
+    def serialize_menu(self, menu_data):
+        menu = menu_data['menu']
+        return {
+            'date': menu.date,
+            'nutrition': {field: float(value) for field, value in menu.nutrition.items()},
+            'cooking_time': menu_data['cooking_time'],
+            'meals': [
+                {
+                    'meal_type': meal['meal_type'],
+                    'dish': _dish_summary(meal['dish']),
+                    'ingredients': [
+                        {**ingredient, 'quantity': float(ingredient['quantity'])}
+                        for ingredient in meal['ingredients']
+                    ],
+                    'more_ingredients': meal['more_ingredients'],
+                }
+                for meal in menu_data['meals']
+            ],
+        }
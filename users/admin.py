@@ -6,5 +6,7 @@ from users.models import CustomUser
 @admin.register(CustomUser)
 class UserAdmin(admin.ModelAdmin):
     list_display = ('email', 'username', 'is_active', 'is_staff')
-    search_fields = ('email',)
+    search_fields = ('email', 'username')
     list_filter = ('is_active',)
+    show_full_result_count = False
+    ordering = ('email',)
@@ -0,0 +1,41 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Удаляет просроченные сессии пачками, не блокируя таблицу сессий надолго'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество сессий, удаляемых одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        engine = import_module(settings.SESSION_ENGINE)
+        get_model_class = getattr(engine.SessionStore, 'get_model_class', None)
+        if get_model_class is None:
+            self.stdout.write(f'Бэкенд {settings.SESSION_ENGINE} не хранит сессии в БД, очистка не требуется.')
+            return
+
+        session_model = get_model_class()
+        batch_size = options['batch_size']
+        now = timezone.now()
+        deleted_total = 0
+        while True:
+            session_keys = list(
+                session_model.objects
+                .filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not session_keys:
+                break
+            deleted, _ = session_model.objects.filter(session_key__in=session_keys).delete()
+            deleted_total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f'Удалено просроченных сессий: {deleted_total}'))
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Поиск пользователей в админке и в фильтрах с автодополнением на PostgreSQL
+# выполняется по GIN-индексам pg_trgm, на остальных СУБД миграция ничего не делает
+TRIGRAM_INDEXES = [
+    ('users_customuser_username_trgm', 'users_customuser', 'username'),
+    ('users_customuser_email_trgm', 'users_customuser', 'email'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)',
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]